@@ -0,0 +1,99 @@
+"""Compare the language-aware classifier with the original per-line one.
+
+    python -m API.benchmarks.classifier --files 2000 --lines 300
+    python -m API.benchmarks.classifier --path /some/checkout
+"""
+import argparse
+import os
+import random
+import time
+from pathlib import Path
+
+from API.constants.Languages import extension_languages
+from API.utils.LineClassifier import classify
+
+SAMPLES = {
+    '.py': [b'import os', b'# comment', b'', b'def f(x):', b'    """Docstring."""', b'    return x  # trailing',
+            b'    """', b'    Multi-line docstring', b'    """', b's = "# not a comment"'],
+    '.js': [b'const x = 1;', b'// comment', b'', b'/*', b' * block', b' */', b'foo(); /* inline */',
+            b'let s = "/* not a comment */";', b'*/'],
+    '.c': [b'#include <stdio.h>', b'int main() {', b'  /* block', b'     body */', b'  *p = 1;', b'  return 0;', b'}', b''],
+    '.html': [b'<div>', b'<!-- comment', b'  still comment -->', b'<p>text</p>', b'', b'</div>'],
+    '.sql': [b'-- comment', b'SELECT *', b'FROM t; -- trailing', b'/* block */', b''],
+}
+
+
+def legacy_classify(data):
+    """The original classifier: prefix checks per decoded line, no state."""
+    lines_of_code = 0
+    comment_lines = 0
+    blank_lines = 0
+    for line in data.decode('utf-8', errors='ignore').splitlines():
+        stripped_line = line.strip()
+        if not stripped_line:
+            blank_lines += 1
+        elif stripped_line.startswith(('#', '//', '/*', '*', '*/')):
+            comment_lines += 1
+        else:
+            lines_of_code += 1
+    return lines_of_code, comment_lines, blank_lines
+
+
+def make_corpus(files, lines, seed):
+    rnd = random.Random(seed)
+    corpus = []
+    for _ in range(files):
+        ext = rnd.choice(list(SAMPLES))
+        body = b'\n'.join(rnd.choice(SAMPLES[ext]) for _ in range(rnd.randint(1, lines)))
+        corpus.append((ext, body + b'\n'))
+    return corpus
+
+
+def load_corpus(path):
+    corpus = []
+    for root, _, files in os.walk(path):
+        for file in files:
+            ext = Path(file).suffix
+            if ext in extension_languages:
+                with open(os.path.join(root, file), 'rb') as f:
+                    corpus.append((ext, f.read()))
+    return corpus
+
+
+def run(name, corpus, fn, repeat):
+    elapsed = None
+    for _ in range(repeat):
+        totals = [0, 0, 0]
+        started = time.perf_counter()
+        for ext, data in corpus:
+            loc, comments, blanks = fn(data, ext)
+            totals[0] += loc
+            totals[1] += comments
+            totals[2] += blanks
+        took = time.perf_counter() - started
+        elapsed = took if elapsed is None else min(elapsed, took)
+    total_lines = sum(totals)
+    print(f"{name:>10}: {elapsed:.3f}s  {total_lines / elapsed:,.0f} lines/s  "
+          f"code={totals[0]} comments={totals[1]} blanks={totals[2]}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--lines', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--path', help='classify the registered source files under this directory instead')
+    parser.add_argument('--repeat', type=int, default=3, help='report the best of this many runs')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.path) if args.path else make_corpus(args.files, args.lines, args.seed)
+    total_lines = sum(data.count(b'\n') for _, data in corpus)
+    print(f"{len(corpus)} files, {total_lines} lines")
+    legacy = run('legacy', corpus, lambda data, ext: legacy_classify(data), args.repeat)
+    current = run('language', corpus, lambda data, ext: classify(data, ext)[1:], args.repeat)
+    print(f"speedup: {legacy / current:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""A local stand-in for the GitHub REST and archive endpoints.
+
+Serves synthetic profiles: every repository is a set of generated source
+files whose history can be extended with `commit`, so listings, repository
+info, head commits, compares, blobs and zip archives all answer like
+GitHub's. Used by `manage.py benchmark`; point GITHUB_API_BASE and
+GITHUB_ARCHIVE_BASE at `FakeGitHub.url` to use it.
+"""
+import asyncio
+import hashlib
+import io
+import random
+import zipfile
+from collections import Counter
+
+from aiohttp import web
+
+from API.benchmarks.classifier import SAMPLES
+from API.utils.CountingEngine import git_blob_sha
+
+DEFAULT_MIX = '.py=4,.js=3,.c=1,.html=1,.sql=1'
+
+
+def parse_mix(spec):
+    """Parse a language mix such as '.py=3,.js=1' into {extension: weight}."""
+    mix = {}
+    for entry in spec.split(','):
+        ext, _, weight = entry.strip().partition('=')
+        if ext not in SAMPLES:
+            raise ValueError(f"No samples for {ext!r}; choose from {', '.join(SAMPLES)}")
+        mix[ext] = float(weight or 1)
+    return mix
+
+
+def make_files(rnd, files, lines, mix):
+    """Generate `files` source files of 1 to `lines` lines each, with
+    extensions drawn from `mix`."""
+    extensions = list(mix)
+    weights = [mix[ext] for ext in extensions]
+    generated = {}
+    for i in range(files):
+        ext = rnd.choices(extensions, weights)[0]
+        body = b'\n'.join(rnd.choice(SAMPLES[ext]) for _ in range(rnd.randint(1, lines)))
+        generated[f"src/pkg{i % 16}/file{i}{ext}"] = body + b'\n'
+    return generated
+
+
+class FakeRepository:
+    def __init__(self, owner, name, files):
+        self.owner = owner
+        self.name = name
+        self.commits = {}  # sha -> {path: data}
+        self.history = []
+        self.archives = {}  # sha -> zip bytes, built once per commit
+        self.blobs = {}
+        self.commit(files)
+
+    @property
+    def head(self):
+        return self.history[-1]
+
+    def commit(self, files):
+        """Make `files` the new head commit and return its sha."""
+        tree = sorted((path, git_blob_sha(data)) for path, data in files.items())
+        sha = hashlib.sha1(repr((self.name, len(self.history), tree)).encode()).hexdigest()
+        self.commits[sha] = dict(files)
+        self.history.append(sha)
+        for data in files.values():
+            self.blobs[git_blob_sha(data)] = data
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+            for path, data in files.items():
+                zip_ref.writestr(f"{self.name}-{sha}/{path}", data)
+        self.archives[sha] = archive.getvalue()
+        return sha
+
+    def metadata(self):
+        return {
+            'name': self.name,
+            'full_name': f"{self.owner}/{self.name}",
+            'owner': {'login': self.owner},
+            'default_branch': 'main',
+            'fork': False,
+            # GitHub reports sizes in kilobytes
+            'size': len(self.archives[self.head]) // 1024 + 1,
+        }
+
+
+class FakeGitHub:
+    def __init__(self, latency=0.0, per_page=100):
+        # Seconds added before every response, to stand in for the network
+        self.latency = latency
+        self.per_page = per_page
+        self.repositories = {}  # (owner, name) -> FakeRepository
+        # Requests served, per route
+        self.requests = Counter()
+        self.runner = None
+        self.url = None
+
+    def add_repository(self, owner, name, files):
+        repository = self.repositories[(owner, name)] = FakeRepository(owner, name, files)
+        return repository
+
+    def add_profile(self, username, repos, files, lines, mix, seed=0):
+        rnd = random.Random(seed)
+        return [
+            self.add_repository(username, f"repo{i}", make_files(rnd, files, lines, mix))
+            for i in range(repos)
+        ]
+
+    def repository(self, request):
+        repository = self.repositories.get((request.match_info['owner'], request.match_info['repo']))
+        if repository is None:
+            raise web.HTTPNotFound()
+        return repository
+
+    @web.middleware
+    async def respond(self, request, handler):
+        self.requests[request.match_info.route.name or 'unknown'] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        response = await handler(request)
+        # API responses carry an ETag and honour If-None-Match, like GitHub's
+        if request.match_info.route.name not in ('archive', 'blob') and response.status == 200:
+            etag = '"%s"' % hashlib.sha1(response.body).hexdigest()
+            if request.headers.get('If-None-Match') == etag:
+                self.requests['not_modified'] += 1
+                return web.Response(status=304, headers={'ETag': etag})
+            response.headers['ETag'] = etag
+        return response
+
+    async def list_repositories(self, request):
+        owner = request.match_info['owner']
+        per_page = int(request.query.get('per_page', self.per_page))
+        page = int(request.query.get('page', 1))
+        repositories = [repository.metadata() for (login, _), repository in self.repositories.items() if login == owner]
+        last = max(1, -(-len(repositories) // per_page))
+        response = web.json_response(repositories[(page - 1) * per_page:page * per_page])
+        links = []
+        if page < last:
+            links.append(f'<{request.url.update_query(page=page + 1)}>; rel="next"')
+            links.append(f'<{request.url.update_query(page=last)}>; rel="last"')
+        if links:
+            response.headers['Link'] = ', '.join(links)
+        return response
+
+    async def get_repository(self, request):
+        return web.json_response(self.repository(request).metadata())
+
+    async def get_commit(self, request):
+        repository = self.repository(request)
+        ref = request.match_info['ref']
+        sha = repository.head if ref == 'main' else ref
+        if sha not in repository.commits:
+            raise web.HTTPNotFound()
+        if request.headers.get('Accept') == 'application/vnd.github.sha':
+            return web.Response(text=sha)
+        return web.json_response({'sha': sha})
+
+    async def compare(self, request):
+        repository = self.repository(request)
+        base, _, head = request.match_info['spec'].partition('...')
+        if base not in repository.commits or head not in repository.commits:
+            raise web.HTTPNotFound()
+        before, after = repository.commits[base], repository.commits[head]
+        files = []
+        for path in sorted(set(before) | set(after)):
+            if path not in after:
+                files.append({'filename': path, 'status': 'removed', 'sha': git_blob_sha(before[path])})
+            elif path not in before:
+                files.append({'filename': path, 'status': 'added', 'sha': git_blob_sha(after[path])})
+            elif before[path] != after[path]:
+                files.append({'filename': path, 'status': 'modified', 'sha': git_blob_sha(after[path])})
+        order = repository.history
+        status = 'identical' if base == head else 'ahead' if order.index(base) < order.index(head) else 'behind'
+        return web.json_response({'status': status, 'files': files})
+
+    async def get_blob(self, request):
+        data = self.repository(request).blobs.get(request.match_info['sha'])
+        if data is None:
+            raise web.HTTPNotFound()
+        return web.Response(body=data)
+
+    async def get_archive(self, request):
+        repository = self.repository(request)
+        ref = request.match_info['ref']
+        sha = repository.head if ref == 'refs/heads/main' else ref
+        if sha not in repository.archives:
+            raise web.HTTPNotFound()
+        return web.Response(body=repository.archives[sha], content_type='application/zip')
+
+    async def start(self, host='127.0.0.1', port=0):
+        app = web.Application(middlewares=[self.respond])
+        app.router.add_get('/users/{owner}/repos', self.list_repositories, name='list')
+        app.router.add_get('/repos/{owner}/{repo}', self.get_repository, name='repository')
+        app.router.add_get('/repos/{owner}/{repo}/commits/{ref}', self.get_commit, name='commit')
+        app.router.add_get('/repos/{owner}/{repo}/compare/{spec}', self.compare, name='compare')
+        app.router.add_get('/repos/{owner}/{repo}/git/blobs/{sha}', self.get_blob, name='blob')
+        app.router.add_get('/{owner}/{repo}/archive/{ref:.+}.zip', self.get_archive, name='archive')
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, host, port).start()
+        host, port = self.runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
@@ -1,3 +1,6 @@
+# Default ignore rules, compiled by API.utils.IgnoreRules. Directory entries
+# may be nested paths ('bootstrap/cache'), extensions may have several dots
+# ('.min.js'), and entries of either kind may be gitignore-style globs.
 default_ignore_dirs = {
     'node_modules', 'dist', 'build', '.git', '.svn', '.hg', '.idea', '.vscode', 
     '__pycache__', '.DS_Store', 'venv', 'env', '.next', '.nuxt', 'target', 
@@ -0,0 +1,74 @@
+# Comment syntax per language, used to classify lines and to bucket totals by
+# language instead of raw file suffix.
+#
+#   line_comments:  tokens that comment out the rest of the line
+#   block_comments: (open, close) pairs that may span lines
+#   docstrings:     (open, close) pairs that count as comments only when they
+#                   start a line, e.g. Python docstrings
+#   strings:        quote characters whose contents never start a comment
+
+C_STYLE = {
+    'line_comments': ['//'],
+    'block_comments': [('/*', '*/')],
+    'strings': ['"', "'"],
+}
+
+HASH_STYLE = {
+    'line_comments': ['#'],
+    'strings': ['"', "'"],
+}
+
+MARKUP_STYLE = {
+    'block_comments': [('<!--', '-->')],
+}
+
+languages = {
+    'Python': {
+        'extensions': ['.py', '.pyw', '.pyi'],
+        'line_comments': ['#'],
+        'docstrings': [('"""', '"""'), ("'''", "'''")],
+        'strings': ['"""', "'''", '"', "'"],
+    },
+    'JavaScript': {**C_STYLE, 'extensions': ['.js', '.mjs', '.cjs', '.jsx'], 'strings': ['"', "'", '`']},
+    'TypeScript': {**C_STYLE, 'extensions': ['.ts', '.mts', '.cts', '.tsx'], 'strings': ['"', "'", '`']},
+    'Java': {**C_STYLE, 'extensions': ['.java']},
+    'C': {**C_STYLE, 'extensions': ['.c', '.h']},
+    'C++': {**C_STYLE, 'extensions': ['.cpp', '.cc', '.cxx', '.hpp', '.hh', '.hxx']},
+    'C#': {**C_STYLE, 'extensions': ['.cs']},
+    'Go': {**C_STYLE, 'extensions': ['.go'], 'strings': ['"', "'", '`']},
+    'Rust': {**C_STYLE, 'extensions': ['.rs'], 'strings': ['"']},
+    'Kotlin': {**C_STYLE, 'extensions': ['.kt', '.kts']},
+    'Swift': {**C_STYLE, 'extensions': ['.swift']},
+    'Scala': {**C_STYLE, 'extensions': ['.scala']},
+    'Dart': {**C_STYLE, 'extensions': ['.dart']},
+    'Objective-C': {**C_STYLE, 'extensions': ['.m', '.mm']},
+    'PHP': {**C_STYLE, 'extensions': ['.php'], 'line_comments': ['//', '#']},
+    'CSS': {'extensions': ['.css'], 'block_comments': [('/*', '*/')], 'strings': ['"', "'"]},
+    'SCSS': {**C_STYLE, 'extensions': ['.scss']},
+    'Less': {**C_STYLE, 'extensions': ['.less']},
+    'HTML': {**MARKUP_STYLE, 'extensions': ['.html', '.htm']},
+    'XML': {**MARKUP_STYLE, 'extensions': ['.xml', '.xaml', '.csproj']},
+    'Vue': {**C_STYLE, 'extensions': ['.vue'], 'block_comments': [('<!--', '-->'), ('/*', '*/')]},
+    'Svelte': {**C_STYLE, 'extensions': ['.svelte'], 'block_comments': [('<!--', '-->'), ('/*', '*/')]},
+    'Markdown': {**MARKUP_STYLE, 'extensions': ['.md', '.markdown']},
+    'SQL': {'extensions': ['.sql'], 'line_comments': ['--'], 'block_comments': [('/*', '*/')], 'strings': ["'"]},
+    'Shell': {**HASH_STYLE, 'extensions': ['.sh', '.bash', '.zsh', '.fish']},
+    'PowerShell': {**HASH_STYLE, 'extensions': ['.ps1', '.psm1'], 'block_comments': [('<#', '#>')]},
+    'Ruby': {**HASH_STYLE, 'extensions': ['.rb'], 'docstrings': [('=begin', '=end')]},
+    'Perl': {**HASH_STYLE, 'extensions': ['.pl', '.pm']},
+    'R': {**HASH_STYLE, 'extensions': ['.r', '.R']},
+    'Elixir': {**HASH_STYLE, 'extensions': ['.ex', '.exs']},
+    'YAML': {**HASH_STYLE, 'extensions': ['.yml', '.yaml']},
+    'TOML': {**HASH_STYLE, 'extensions': ['.toml']},
+    'Lua': {'extensions': ['.lua'], 'line_comments': ['--'], 'block_comments': [('--[[', ']]')], 'strings': ['"', "'"]},
+    'Haskell': {'extensions': ['.hs'], 'line_comments': ['--'], 'block_comments': [('{-', '-}')], 'strings': ['"']},
+    'JSON': {'extensions': ['.json']},
+    'Text': {'extensions': ['.txt']},
+}
+
+# Reverse lookup built once at import
+extension_languages = {
+    extension: name
+    for name, language in languages.items()
+    for extension in language['extensions']
+}
@@ -0,0 +1,288 @@
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import aclosing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.test import AsyncRequestFactory
+
+from API.benchmarks.fake_github import DEFAULT_MIX, FakeGitHub, make_files, parse_mix
+from API.constants.ExtensionFilters import default_ignore_dirs, default_ignore_extensions
+from API.utils.AnalysisPipeline import iter_analyses
+from API.utils.EventLoop import run
+from API.utils.JobQueue import claim_job, run_job
+from API.utils.LinesOfCode import RepoAnalyzer
+from API.utils.RepositoryListing import iter_repositories
+from API.views import getLinesOfCode
+from Models.models import RepositoryRecord, UserRecord
+
+USERNAME = 'benchmark-user'
+
+
+def peak_rss():
+    """Peak resident set size so far, in kilobytes, of this process and of
+    its largest finished child (the counting pool)."""
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Stage:
+    def __init__(self, fake, files=0, lines=0):
+        self.fake = fake
+        self.files = files
+        self.lines = lines
+
+    def __enter__(self):
+        self.requests = sum(self.fake.requests.values())
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wall = time.perf_counter() - self.started
+        self.requests = sum(self.fake.requests.values()) - self.requests
+
+    def report(self):
+        rss, children_rss = peak_rss()
+        return {
+            'wall_s': round(self.wall, 4),
+            'files': self.files,
+            'lines': self.lines,
+            'files_per_s': round(self.files / self.wall, 1) if self.wall else None,
+            'lines_per_s': round(self.lines / self.wall, 1) if self.wall else None,
+            'github_requests': self.requests,
+            'peak_rss_kb': rss,
+            'peak_children_rss_kb': children_rss,
+        }
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the analysis pipeline end to end against a local fake GitHub'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repos', type=int, default=8)
+        parser.add_argument('--files', type=int, default=300, help='files per repository')
+        parser.add_argument('--lines', type=int, default=200, help='maximum lines per file')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help='language mix, e.g. ".py=3,.js=1"')
+        parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every fake GitHub response')
+        parser.add_argument('--changed', type=float, default=0.05, help='share of files edited before the incremental stage')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+        parser.add_argument('--compare', help='JSON results of an earlier run to compare wall times with')
+
+    def handle(self, *args, **options):
+        if options['verbosity'] < 2:
+            logging.getLogger().setLevel(logging.WARNING)
+        # The fake GitHub's traffic must not end up in the real metrics
+        settings.METRICS_DIR = ''
+
+        # Everything runs against a throwaway database, never the real one.
+        # SQLite's default in-memory test database uses a shared cache, whose
+        # table locks fail at once instead of waiting, while the worker thread
+        # and the streaming view write concurrently; use a file instead.
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'githubdev-benchmark.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        fake = FakeGitHub(latency=options['latency'])
+        try:
+            run(fake.start())
+            settings.GITHUB_API_BASE = fake.url
+            settings.GITHUB_ARCHIVE_BASE = fake.url
+            results = self.benchmark(fake, options)
+        finally:
+            run(fake.stop())
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.print_table(results)
+        else:
+            self.stdout.write(output)
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.print_comparison(json.load(f), results)
+
+    def benchmark(self, fake, options):
+        mix = parse_mix(options['mix'])
+        repositories = fake.add_profile(USERNAME, options['repos'], options['files'], options['lines'], mix, options['seed'])
+        total_files = sum(len(repository.commits[repository.head]) for repository in repositories)
+        total_lines = sum(
+            data.count(b'\n') for repository in repositories for data in repository.commits[repository.head].values()
+        )
+        stages = {}
+
+        with Stage(fake) as stage:
+            listed = run(self.list_repositories())
+        stages['listing'] = stage.report()
+
+        with Stage(fake, total_files, total_lines) as stage:
+            archives = run(self.download(listed))
+        stages['download'] = {**stage.report(), 'bytes': sum(size for _, size in archives)}
+
+        with Stage(fake, total_files, total_lines) as stage:
+            for analyzer, _ in archives:
+                analyzer.analyze_downloaded()
+        stages['count'] = stage.report()
+
+        with Stage(fake, total_files, total_lines) as stage:
+            self.analyze_profile()
+        stages['analysis_cold'] = stage.report()
+
+        with Stage(fake) as stage:
+            self.analyze_profile()
+        stages['analysis_cached'] = stage.report()
+
+        changed_files, changed_lines = self.edit_repositories(repositories, options, mix)
+        with Stage(fake, changed_files, changed_lines) as stage:
+            self.analyze_profile()
+        stages['analysis_incremental'] = stage.report()
+
+        RepositoryRecord.objects.all().delete()
+        UserRecord.objects.all().delete()
+        with Stage(fake, total_files, total_lines) as stage:
+            events = self.stream_lines_of_code()
+        stages['getLinesOfCode'] = {**stage.report(), 'events': events}
+
+        return {
+            'commit': current_commit(),
+            'python': platform.python_version(),
+            'config': {
+                key: options[key] for key in ('repos', 'files', 'lines', 'mix', 'latency', 'changed', 'seed')
+            },
+            'settings': {
+                key: getattr(settings, key) for key in (
+                    'ANALYSIS_CONCURRENCY', 'ANALYSIS_IN_MEMORY', 'COUNTING_PROCESSES', 'INCREMENTAL_ANALYSIS',
+                    'JOB_POLL_INTERVAL', 'HTTP_CACHE',
+                )
+            },
+            'profile': {'files': total_files, 'lines': total_lines},
+            'stages': stages,
+        }
+
+    async def list_repositories(self):
+        return [repository async for repository in iter_repositories(USERNAME)]
+
+    async def download(self, listed):
+        analyzers = [
+            BenchmarkAnalyzer(USERNAME, repository['name'], default_ignore_dirs, default_ignore_extensions, repo_metadata=repository)
+            for repository in listed
+        ]
+        return [await analyzer.download() for analyzer in analyzers]
+
+    def analyze_profile(self):
+        analyses = iter_analyses(
+            USERNAME, iter_repositories(USERNAME), default_ignore_dirs, default_ignore_extensions,
+            settings.ANALYSIS_CONCURRENCY, settings.MAX_REPOSITORY_SIZE
+        )
+        for repository, _, error, _ in analyses:
+            if error is not None:
+                raise Exception(f"Analysis of {repository['name']} failed: {error}")
+
+    def edit_repositories(self, repositories, options, mix):
+        rnd = random.Random(options['seed'] + 1)
+        changed_files = 0
+        changed_lines = 0
+        for repository in repositories:
+            files = dict(repository.commits[repository.head])
+            paths = rnd.sample(sorted(files), max(1, int(len(files) * options['changed'])))
+            replacements = make_files(rnd, len(paths), options['lines'], mix)
+            for path, data in zip(paths, replacements.values()):
+                files[path] = data
+                changed_lines += data.count(b'\n')
+            changed_files += len(paths)
+            repository.commit(files)
+        return changed_files, changed_lines
+
+    def stream_lines_of_code(self):
+        """Request the profile through the view while a worker thread runs the
+        job it queues, as the web server and `run_analysis_worker` would."""
+
+        done = threading.Event()
+
+        def work():
+            try:
+                while not done.is_set():
+                    job = claim_job('benchmark')
+                    if job is not None:
+                        run_job(job)
+                        return
+                    done.wait(settings.JOB_POLL_INTERVAL)
+            finally:
+                connection.close()
+
+        async def stream():
+            request = AsyncRequestFactory().get(f'/API/getLinesOfCode/{USERNAME}/')
+            response = await getLinesOfCode(request, USERNAME)
+            events = 0
+            async with aclosing(response.streaming_content) as chunks:
+                async for chunk in chunks:
+                    events += 1
+                    if b'"type": "error"' in chunk:
+                        raise Exception(f"getLinesOfCode failed: {chunk.decode()}")
+            return events
+
+        worker = threading.Thread(target=work)
+        worker.start()
+        try:
+            return run(stream())
+        finally:
+            done.set()
+            worker.join()
+            close_old_connections()
+
+    def print_table(self, results):
+        self.stdout.write(f"{results['profile']['files']} files, {results['profile']['lines']} lines")
+        for name, stage in results['stages'].items():
+            self.stdout.write(
+                f"{name:>22}: {stage['wall_s']:8.3f}s  {stage['files_per_s'] or 0:>10,.0f} files/s  "
+                f"{stage['lines_per_s'] or 0:>12,.0f} lines/s  {stage['github_requests']:>5} requests  "
+                f"peak RSS {stage['peak_rss_kb'] // 1024} MB"
+            )
+
+    def print_comparison(self, before, after):
+        self.stdout.write(f"Compared with {before.get('commit') or 'previous run'}:")
+        for name, stage in after['stages'].items():
+            previous = before.get('stages', {}).get(name)
+            if not previous or not previous['wall_s']:
+                continue
+            change = (stage['wall_s'] - previous['wall_s']) / previous['wall_s'] * 100
+            self.stdout.write(f"{name:>22}: {previous['wall_s']:8.3f}s -> {stage['wall_s']:8.3f}s  ({change:+.1f}%)")
+
+
+class BenchmarkAnalyzer(RepoAnalyzer):
+    """Splits an analysis into its download and counting halves so each can
+    be timed on its own."""
+
+    async def download(self):
+        await self.get_head_sha()
+        self.archive, _ = await self.download_repo()
+        self.archive.seek(0, 2)
+        size = self.archive.tell()
+        self.archive.seek(0)
+        return self, size
+
+    def analyze_downloaded(self):
+        with self.archive:
+            return self.count_lines_in_archive(self.archive)
@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from API.constants.ExtensionFilters import default_ignore_dirs, default_ignore_extensions
+from API.utils.CountingEngine import shutdown_pool
+from API.utils.JobQueue import claim_job, enqueue, release_job, run_job
+from API.utils.Metrics import publish as publish_metrics
+from Models.models import AnalysisJob, UserRecord
+
+
+class Checkpoint:
+    """Profiles a run has already prewarmed, kept in a JSON file so the same
+    command picks up where an interrupted run stopped."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = {}  # lowercased username -> job status
+        if os.path.exists(path):
+            with open(path) as f:
+                self.done = json.load(f).get('done', {})
+
+    def __contains__(self, username):
+        # Failed profiles are tried again
+        return self.done.get(username.lower()) == AnalysisJob.SUCCEEDED
+
+    def add(self, username, status):
+        with self.lock:
+            self.done[username.lower()] = status
+            with open(self.path + '.tmp', 'w') as f:
+                json.dump({'done': self.done}, f)
+            os.replace(self.path + '.tmp', self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def wait_for(job, poll_interval):
+    while AnalysisJob.objects.filter(id=job.id, status__in=AnalysisJob.ACTIVE_STATUSES).exists():
+        time.sleep(poll_interval)
+    job.refresh_from_db()
+    return job
+
+
+def prewarm(username, worker):
+    """Analyze `username` with the default ignore rules and return the job.
+
+    Goes through the job queue like getLinesOfCode, so a visitor arriving
+    meanwhile follows this analysis instead of starting another.
+    """
+    try:
+        job = enqueue(username, default_ignore_dirs, default_ignore_extensions)
+        claimed = claim_job(worker, job_id=job.id)
+        if claimed is None:
+            # Already running in a worker (or another prewarm)
+            return wait_for(job, settings.JOB_POLL_INTERVAL)
+        try:
+            run_job(claimed)
+        except BaseException:
+            release_job(claimed)
+            raise
+        return claimed
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Analyze profiles ahead of their visitors, so getLinesOfCode answers from stored results'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*')
+        parser.add_argument('--stale-days', type=float, help='also prewarm profiles last analyzed more than this many days ago')
+        parser.add_argument('--limit', type=int, help='prewarm at most this many stale profiles, oldest first')
+        parser.add_argument('--concurrency', type=int, default=settings.PREWARM_CONCURRENCY, help='profiles analyzed at once')
+        parser.add_argument('--checkpoint', default=settings.PREWARM_CHECKPOINT)
+        parser.add_argument('--restart', action='store_true', help='ignore the checkpoint of an interrupted run')
+
+    def handle(self, *args, **options):
+        usernames = self.select_usernames(options)
+        if options['restart'] and os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+        checkpoint = Checkpoint(options['checkpoint'])
+
+        pending = [username for username in usernames if username not in checkpoint]
+        if len(pending) < len(usernames):
+            self.stdout.write(f"Resuming: {len(usernames) - len(pending)} of {len(usernames)} profiles already prewarmed")
+
+        # Runs for hours like a worker, so its analyses show up in /API/metrics
+        publish_metrics()
+        worker = f"{socket.gethostname()}:{os.getpid()}:prewarm"
+        failed = 0
+        executor = ThreadPoolExecutor(max_workers=max(1, options['concurrency']))
+        try:
+            futures = {executor.submit(prewarm, username, worker): username for username in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                username = futures[future]
+                try:
+                    job = future.result()
+                except Exception as e:
+                    logging.error(f"Failed to prewarm {username}: {e}")
+                    failed += 1
+                    continue
+                checkpoint.add(username, job.status)
+                if job.status != AnalysisJob.SUCCEEDED:
+                    failed += 1
+                self.stdout.write(f"[{done}/{len(pending)}] {username}: {job.status}{f' ({job.error})' if job.error else ''}")
+        except KeyboardInterrupt:
+            self.stdout.write("Interrupted; waiting for the profiles being analyzed. Run the command again to resume.")
+            executor.shutdown(wait=True, cancel_futures=True)
+            return
+        finally:
+            executor.shutdown(wait=True)
+            shutdown_pool()
+
+        if failed:
+            # Keep the checkpoint so a rerun only retries the failures
+            raise CommandError(f"{failed} of {len(pending)} profiles failed")
+        checkpoint.remove()
+        self.stdout.write(f"Prewarmed {len(pending)} profiles")
+
+    def select_usernames(self, options):
+        usernames = list(options['usernames'])
+        if options['stale_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['stale_days'])
+            stale = UserRecord.objects.filter(date_requested__lt=cutoff).order_by('date_requested')
+            if options['limit'] is not None:
+                stale = stale[:options['limit']]
+            usernames += stale.values_list('username', flat=True)
+        if not usernames:
+            raise CommandError('Give usernames to prewarm, or --stale-days')
+
+        # One analysis per profile, whatever the case it was given in
+        unique = {}
+        for username in usernames:
+            unique.setdefault(username.lower(), username)
+        return list(unique.values())
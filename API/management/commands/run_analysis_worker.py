@@ -0,0 +1,88 @@
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def work(stop, poll_interval):
+    """Worker process: claim queued jobs and run them one at a time until `stop` is set."""
+    import django
+    django.setup()
+    from django.db import close_old_connections
+    from API.utils.CountingEngine import shutdown_pool
+    from API.utils.JobQueue import claim_job, release_job, run_job
+    from API.utils.Metrics import publish as publish_metrics
+
+    publish_metrics()
+
+    # Shutdown is driven by the parent setting `stop`, so the current job
+    # finishes instead of dying halfway through
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    logging.info(f"Analysis worker {worker} started")
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            job = claim_job(worker)
+            if job is None:
+                stop.wait(poll_interval)
+                continue
+            logging.info(f"Worker {worker} running analysis job {job.id} for {job.username}")
+            try:
+                run_job(job)
+            except BaseException:
+                release_job(job)
+                raise
+    finally:
+        shutdown_pool()
+        logging.info(f"Analysis worker {worker} stopped")
+
+
+def interrupt(signum, frame):
+    # Later signals would only cut the wait for running jobs short
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+
+class Command(BaseCommand):
+    help = 'Run queued profile analyses in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.ANALYSIS_WORKERS)
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL)
+
+    def handle(self, *args, **options):
+        from API.utils.JobQueue import prune_finished_jobs, requeue_stale_jobs
+
+        # Spawned, not forked: each worker starts its own event loop and
+        # counting pool, and non-daemonic so it may create that pool
+        context = multiprocessing.get_context('spawn')
+        stop = context.Event()
+        processes = [None] * max(1, options['processes'])
+
+        signal.signal(signal.SIGTERM, interrupt)
+        try:
+            while not stop.is_set():
+                for index, process in enumerate(processes):
+                    if process is None or not process.is_alive():
+                        if process is not None:
+                            logging.warning(f"Analysis worker {process.pid} exited with {process.exitcode}, restarting")
+                        process = context.Process(target=work, args=(stop, options['poll_interval']), name=f'analysis-worker-{index}')
+                        process.start()
+                        processes[index] = process
+                requeue_stale_jobs()
+                prune_finished_jobs()
+                stop.wait(settings.JOB_HEARTBEAT_INTERVAL)
+        except KeyboardInterrupt:
+            logging.info("Stopping analysis workers after their current jobs")
+        finally:
+            stop.set()
+            for process in processes:
+                if process is not None:
+                    process.join()
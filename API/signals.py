@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from Models.models import UserRecord
+from API.utils import Leaderboard
+
+
+@receiver(post_save, sender=UserRecord)
+def update_language_stats(sender, instance, **kwargs):
+    Leaderboard.save_language_stats(instance)
+
+
+@receiver(post_save, sender=UserRecord)
+@receiver(post_delete, sender=UserRecord)
+def invalidate_leaderboard(sender, **kwargs):
+    Leaderboard.invalidate()
@@ -1,3 +1,256 @@
-from django.test import TestCase
+import re
+from collections import Counter
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from API.benchmarks.fake_github import FakeGitHub
+from API.utils.AnalysisPipeline import analyze_repository
+from API.utils.ContentSniffer import GENERATED, sniff
+from API.utils.EventLoop import run
+from API.utils.IgnoreRules import IgnoreMatcher, glob_to_regex
+from API.utils.JobQueue import add_event, claim_job, enqueue, finish_job, prune_finished_jobs, requeue_stale_jobs
+from API.utils.JobStream import follow
+from API.utils.Leaderboard import decode_cursor, encode_cursor, seek
+from API.utils.LineClassifier import classify
+from Models.models import AnalysisJob, AnalysisJobEvent, RepositoryRecord, UserRecord
+
+
+class IncrementalAnalysisTests(TransactionTestCase):
+    """An incremental analysis must give the same result as a full one."""
+
+    def setUp(self):
+        self.fake = FakeGitHub()
+        run(self.fake.start())
+        self.addCleanup(run, self.fake.stop())
+        settings = override_settings(
+            GITHUB_API_BASE=self.fake.url, GITHUB_ARCHIVE_BASE=self.fake.url, INCREMENTAL_ANALYSIS=True
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def analyze(self, repository):
+        return run(analyze_repository('octocat', repository.metadata(), set(), set()))
+
+    def assert_incremental_matches_full(self, files, new_files):
+        repository = self.fake.add_repository('octocat', 'repo', files)
+        self.analyze(repository)
+        repository.commit(new_files)
+        incremental = self.analyze(repository)
+        self.assertGreater(self.fake.requests['compare'], 0)
+
+        RepositoryRecord.objects.all().delete()
+        full = self.analyze(repository)
+        self.assertEqual(incremental, full)
+        return full
+
+    def test_extensionless_files(self):
+        files = {
+            'main.py': b'x = 1\n',
+            'Makefile': b'all:\n\techo hi\n',
+            'LICENSE': b'MIT License\n',
+        }
+        new_files = {'main.py': files['main.py'], 'Makefile': b'all:\n\techo hello\n\techo again\n\techo done\n'}
+        result = self.assert_incremental_matches_full(files, new_files)
+        self.assertEqual(result['locByLangs'], {'Python': 1})
+
+    def test_only_extensionless_file_removed(self):
+        files = {'main.py': b'x = 1\n', 'README': b'read me\nplease\n'}
+        self.assert_incremental_matches_full(files, {'main.py': files['main.py']})
+
+    def test_directories_recorded(self):
+        files = {'src/app/main.py': b'x = 1\n', 'src/app/data.bin': b'\x00\x01', 'docs/index.md': b'# Docs\n'}
+        new_files = {**files, 'src/lib/util/helper.py': b'y = 2\n', 'tests/test_app.py': b'z = 3\n'}
+        recorded = []
+        with mock.patch('API.utils.DirectoryStats.record', side_effect=lambda counter: recorded.append(Counter(counter))):
+            self.assert_incremental_matches_full(files, new_files)
+        full, incremental, refreshed = recorded
+        self.assertEqual(incremental, refreshed)
+        self.assertEqual(incremental, Counter({'src': 1, 'app': 1, 'docs': 1, 'lib': 1, 'util': 1, 'tests': 1}))
+
+
+class LineClassifierTests(SimpleTestCase):
+    """classify() returns (language, code, comments, blanks)."""
+
+    def test_docstrings_and_strings(self):
+        source = (
+            b'def f():\n'
+            b'    """Doc.\n'
+            b'\n'
+            b'    more\n'
+            b'    """\n'
+            b'    s = """not\n'
+            b'    a docstring"""\n'
+            b'    return 1\n'
+        )
+        # A triple-quoted string that does not start its line is code
+        self.assertEqual(classify(source, '.py'), ('Python', 4, 3, 1))
+
+    def test_comment_opener_inside_string(self):
+        source = b'let s = "/* not a comment";\nx = 1; // trailing\n/* a\n   b */\n'
+        self.assertEqual(classify(source, '.js'), ('JavaScript', 2, 2, 0))
+
+    def test_crlf(self):
+        self.assertEqual(classify(b'x = 1\r\n\r\n# c\r\n"""\r\nDoc\r\n"""\r\n', '.py'), ('Python', 1, 4, 1))
+        self.assertEqual(classify(b'/* a\r\n * b\r\n */\r\nint x;\r\n', '.c'), ('C', 1, 3, 0))
+
+    def test_languages_sharing_syntax(self):
+        self.assertEqual(classify(b'a { }\n// c\n', '.less'), ('Less', 1, 1, 0))
+        self.assertEqual(classify(b'<!-- c -->\n<div/>\n', '.svelte'), ('Svelte', 1, 1, 0))
+
+    def test_unknown_extension(self):
+        self.assertEqual(classify(b'x\n# c\n\n', '.unknown'), ('.unknown', 1, 1, 1))
+
+
+class IgnoreRulesTests(SimpleTestCase):
+    def matches(self, glob, path):
+        return re.fullmatch(glob_to_regex(glob), path) is not None
+
+    def test_glob_to_regex(self):
+        self.assertTrue(self.matches('*.pyc', 'a/b/c.pyc'))
+        self.assertTrue(self.matches('docs/*.md', 'docs/a.md'))
+        # A pattern with a slash is anchored, and * does not span directories
+        self.assertFalse(self.matches('docs/*.md', 'src/docs/a.md'))
+        self.assertFalse(self.matches('docs/*.md', 'docs/x/a.md'))
+        self.assertTrue(self.matches('**/test/**', 'a/test/b/c.py'))
+        self.assertTrue(self.matches('*.py[co]', 'a.pyo'))
+        self.assertFalse(self.matches('*.py[!c]', 'a.pyc'))
+        # Everything under a matched directory
+        self.assertTrue(self.matches('vendor', 'src/vendor/lib/a.js'))
+
+    def test_nested_directories(self):
+        matcher = IgnoreMatcher(['node_modules', 'bootstrap/cache'], [])
+        self.assertTrue(matcher.ignores_file('node_modules/a.js'))
+        self.assertTrue(matcher.ignores_file('src/node_modules/pkg/index.js'))
+        self.assertTrue(matcher.ignores_file('bootstrap/cache/a.php'))
+        self.assertTrue(matcher.ignores_file('app/bootstrap/cache/services.php'))
+        self.assertFalse(matcher.ignores_file('app/bootstrap/app.php'))
+        self.assertFalse(matcher.ignores_file('cache/a.php'))
+        self.assertFalse(matcher.ignores_file('node_modules.js'))
+
+    def test_multi_dot_extensions(self):
+        matcher = IgnoreMatcher([], ['.min.js'])
+        self.assertTrue(matcher.ignores_file('app.min.js'))
+        self.assertTrue(matcher.ignores_file('static/lib/x.min.js'))
+        self.assertFalse(matcher.ignores_file('app.js'))
+        self.assertFalse(matcher.ignores_file('min.js'))
+        self.assertTrue(IgnoreMatcher([], ['.js']).ignores_file('app.min.js'))
+
+    def test_dotfiles(self):
+        matcher = IgnoreMatcher([], ['.env'])
+        self.assertTrue(matcher.ignores_file('.env'))
+        self.assertTrue(matcher.ignores_file('config/.env'))
+        self.assertTrue(matcher.ignores_file('local.env'))
+        self.assertFalse(matcher.ignores_file('.envrc'))
+        self.assertFalse(matcher.ignores_file('env'))
+
+    def test_globs(self):
+        matcher = IgnoreMatcher(['build-*'], ['*.lock'])
+        self.assertTrue(matcher.ignores_file('yarn.lock'))
+        self.assertTrue(matcher.ignores_file('build-debug/out.c'))
+        self.assertFalse(matcher.ignores_file('src/build/out.c'))
+
+
+class LeaderboardSeekTests(TestCase):
+    def setUp(self):
+        for username, lines_of_code in [('a', 30), ('b', 20), ('c', 20), ('d', 20), ('e', 10)]:
+            UserRecord.objects.create(username=username, lines_of_code=lines_of_code, lines_of_code_per_language={})
+        self.rows = UserRecord.objects.order_by('-lines_of_code', '-id')
+
+    def pages(self, size):
+        cursor = None
+        while True:
+            page = list(seek(self.rows, cursor)[:size])
+            if not page:
+                return
+            yield [row.username for row in page]
+            cursor = encode_cursor(page[-1])
+
+    def test_pages_cover_every_row_once(self):
+        # Ties on lines_of_code fall back to the id, so no row is repeated or skipped
+        expected = [row.username for row in self.rows]
+        for size in (1, 2, 3, 5):
+            pages = list(self.pages(size))
+            self.assertEqual(sum(pages, []), expected)
+
+    def test_no_cursor(self):
+        self.assertEqual(list(seek(self.rows, None)), list(self.rows))
+
+    def test_cursor_round_trip(self):
+        row = self.rows[1]
+        self.assertEqual(decode_cursor(encode_cursor(row)), (row.lines_of_code, row.id))
+        with self.assertRaises(Exception):
+            decode_cursor('not-a-cursor')
+
+
+class ContentSnifferTests(SimpleTestCase):
+    def sniff(self, head):
+        return sniff(head, len(head))
+
+    def test_generated_headers(self):
+        for head in [
+            b'// Code generated by protoc-gen-go. DO NOT EDIT.\npackage foo\n',
+            b'# Generated by the protocol buffer compiler.  DO NOT EDIT!\n# source: foo.proto\n',
+            b'/**\n * @generated SignedSource<<abc>>\n */\n',
+            b'// <auto-generated />\nnamespace Foo {}\n',
+        ]:
+            self.assertEqual(self.sniff(head), GENERATED, head)
+
+    def test_hand_written_code_mentioning_generation(self):
+        for head in [
+            b'class User(models.Model):\n    # id is auto-generated by the database\n    name = models.TextField()\n',
+            b'def slug(self):\n    """Return the automatically generated slug."""\n    return self._slug\n',
+            b'# Please do not edit the tests without updating the fixtures\nimport os\n',
+        ]:
+            self.assertIsNone(self.sniff(head), head)
+
+    def test_marker_after_header(self):
+        head = b'x = 1\n' * 300 + b'// Code generated by hand. DO NOT EDIT.\n'
+        self.assertIsNone(self.sniff(head))
+
+
+class JobQueueTests(TransactionTestCase):
+    def events(self, job, after=0):
+        async def collect():
+            return [(seq, data) async for seq, data in follow(job, after)]
+        return run(collect(), timeout=10)
+
+    def test_requeued_job_does_not_replay_abandoned_attempt(self):
+        job = enqueue('octocat', set(), set())
+        first = claim_job('worker-1')
+        add_event(first, {'type': 'progress', 'processedRepos': 1})
+        add_event(first, {'type': 'progress', 'processedRepos': 2})
+        AnalysisJob.objects.filter(id=job.id).update(heartbeat=timezone.now() - timedelta(hours=1))
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertFalse(AnalysisJobEvent.objects.filter(job=job).exists())
+
+        second = claim_job('worker-2')
+        self.assertEqual(second.attempts, 2)
+        add_event(second, {'type': 'progress', 'processedRepos': 1})
+        finish_job(second, AnalysisJob.SUCCEEDED)
+        # The abandoned attempt's worker can no longer record anything
+        self.assertFalse(add_event(first, {'type': 'progress', 'processedRepos': 3}))
+
+        self.assertEqual(self.events(job), [(3, {'type': 'progress', 'processedRepos': 1})])
+        # A client resuming from an event of the abandoned attempt
+        self.assertEqual(self.events(job, after=2), [(3, {'type': 'progress', 'processedRepos': 1})])
+
+    def test_prune_finished_jobs(self):
+        old = timezone.now() - timedelta(days=30)
+        expired = AnalysisJob.objects.create(
+            username='a', rules_hash='x', ignore_dirs=[], ignore_extensions=[],
+            status=AnalysisJob.SUCCEEDED, date_finished=old,
+        )
+        AnalysisJobEvent.objects.create(job=expired, seq=1, data={})
+        recent = AnalysisJob.objects.create(
+            username='b', rules_hash='x', ignore_dirs=[], ignore_extensions=[],
+            status=AnalysisJob.FAILED, date_finished=timezone.now(),
+        )
+        running = AnalysisJob.objects.create(
+            username='c', rules_hash='x', ignore_dirs=[], ignore_extensions=[], status=AnalysisJob.RUNNING,
+        )
+        self.assertEqual(prune_finished_jobs(batch_size=1), 1)
+        self.assertEqual(set(AnalysisJob.objects.values_list('id', flat=True)), {recent.id, running.id})
+        self.assertFalse(AnalysisJobEvent.objects.exists())
@@ -4,6 +4,10 @@ from API import views
 urlpatterns = [
      path('getExtensions', views.getExtensions),
      path('getLeaderboard', views.getLeaderboard),
+     path('getLanguageLeaderboard/<str:language>', views.getLanguageLeaderboard),
+     path('getLanguageTotals', views.getLanguageTotals),
      path('refreshAccountData/<str:username>', views.refreshAccountData),
      path('getLinesOfCode/<str:username>', views.getLinesOfCode),
+     path('getCommonDirectories', views.getCommonDirectories),
+     path('metrics', views.getMetrics),
 ]
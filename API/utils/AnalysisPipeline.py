@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import queue
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from API.utils.EventLoop import submit
+from API.utils.LinesOfCode import RepoAnalyzer
+from API.utils.Metrics import ANALYSES_IN_PROGRESS, CACHE_REQUESTS, REPOSITORIES, STAGE_SECONDS
+from API.utils.RepositoryListing import skip_reason
+from API.utils.RepositoryCache import (
+    rules_hash, get_cached_result, get_previous_result, get_file_entries, store_result, store_incremental
+)
+
+_DONE = object()
+
+
+async def analyze_repository(username, repository, ignore_dirs, ignore_extensions):
+    with ANALYSES_IN_PROGRESS.track_in_progress():
+        return await _analyze_repository(username, repository, ignore_dirs, ignore_extensions)
+
+
+async def _analyze_repository(username, repository, ignore_dirs, ignore_extensions):
+    # Results are cached per repository commit, so key on the real owner
+    owner = repository.get('owner', {}).get('login', username)
+    name = repository['name']
+    analyzer = RepoAnalyzer(
+        owner, name, ignore_dirs, ignore_extensions,
+        in_memory=settings.ANALYSIS_IN_MEMORY,
+        max_archive_bytes=settings.MAX_ARCHIVE_BYTES,
+        spool_threshold=settings.ARCHIVE_SPOOL_THRESHOLD,
+        repo_metadata=repository,
+    )
+    commit_sha = await analyzer.get_head_sha()
+    rules = rules_hash(ignore_dirs, ignore_extensions)
+
+    cached = await sync_to_async(get_cached_result)(owner, name, commit_sha, rules)
+    if cached is not None:
+        logging.info(f"Using cached analysis for {owner}/{name}@{commit_sha}")
+        CACHE_REQUESTS.inc(cache='repository', result='hit')
+        REPOSITORIES.inc(result='cached')
+        return cached
+    CACHE_REQUESTS.inc(cache='repository', result='miss')
+
+    previous = None
+    if settings.INCREMENTAL_ANALYSIS:
+        previous = await sync_to_async(get_previous_result)(owner, name, rules)
+    if previous is not None:
+        record_id, base_sha, base_result, base_directories = previous
+        try:
+            result, changed, removed = await analyzer.analyze_incremental(
+                base_sha, base_result, sync_to_async(partial(get_file_entries, record_id)), base_directories
+            )
+            with STAGE_SECONDS.time(stage='db_save'):
+                await sync_to_async(store_incremental)(
+                    record_id, commit_sha, result, changed, removed, analyzer.directories
+                )
+            REPOSITORIES.inc(result='incremental')
+            return result
+        except Exception as e:
+            logging.warning(f"Incremental analysis of {owner}/{name} failed, counting the full archive: {e}")
+
+    result = await analyzer.analyze_async()
+    with STAGE_SECONDS.time(stage='db_save'):
+        await sync_to_async(store_result)(owner, name, commit_sha, rules, result, analyzer.files, analyzer.directories)
+    REPOSITORIES.inc(result='full')
+    return result
+
+
+async def analyze_repositories(username, repositories, ignore_dirs, ignore_extensions, concurrency, max_repository_size):
+    """Analyze an async stream of repositories with at most `concurrency` of
+    them in flight.
+
+    Yields (repository, result, error, listed) tuples in completion order,
+    where `listed` is how many repositories the stream has produced so far.
+    Repositories rejected by skip_reason are yielded straight away with an
+    error and never queued.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results = asyncio.Queue()
+    tasks = []
+    listed = 0
+
+    async def run(repository):
+        async with semaphore:
+            try:
+                result = await analyze_repository(username, repository, ignore_dirs, ignore_extensions)
+                await results.put((repository, result, None))
+            except Exception as e:
+                logging.error(f"Failed to analyze {username}/{repository['name']}: {e}")
+                REPOSITORIES.inc(result='failed')
+                await results.put((repository, None, e))
+
+    async def feed():
+        nonlocal listed
+        try:
+            async for repository in repositories:
+                listed += 1
+                reason = skip_reason(repository, max_repository_size)
+                if reason:
+                    REPOSITORIES.inc(result='skipped')
+                    await results.put((repository, None, Exception(f"Repository {repository['name']} {reason}")))
+                    continue
+                tasks.append(asyncio.ensure_future(run(repository)))
+            await asyncio.gather(*tasks)
+        finally:
+            await results.put(_DONE)
+
+    feeder = asyncio.ensure_future(feed())
+    try:
+        while True:
+            item = await results.get()
+            if item is _DONE:
+                break
+            repository, result, error = item
+            yield repository, result, error, listed
+        # Surfaces listing failures
+        await feeder
+    finally:
+        feeder.cancel()
+        for task in tasks:
+            task.cancel()
+
+
+def iter_analyses(username, repositories, ignore_dirs, ignore_extensions, concurrency, max_repository_size):
+    """Sync bridge over analyze_repositories for use inside streaming responses.
+
+    The analyses run on the shared event loop; results are handed back through
+    a queue as they complete. Closing the generator (e.g. when the client
+    disconnects) cancels whatever is still running.
+    """
+    results = queue.Queue()
+
+    async def produce():
+        try:
+            analyses = analyze_repositories(username, repositories, ignore_dirs, ignore_extensions, concurrency, max_repository_size)
+            async for item in analyses:
+                results.put(item)
+        finally:
+            results.put(_DONE)
+
+    future = submit(produce())
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                break
+            yield item
+        future.result()
+    finally:
+        future.cancel()
@@ -0,0 +1,41 @@
+import re
+
+# Only this much of a file is read before deciding whether to count it
+SNIFF_BYTES = 8 * 1024
+# Minified bundles and data dumps put thousands of characters on a line;
+# hand-written code averages well under 100
+MAX_AVERAGE_LINE_LENGTH = 400
+# Generated-file markers are only looked for in the header. Only the
+# headers code generators actually write are recognised, not loose phrases
+# like "do not edit" that hand-written comments and docstrings use too:
+#   @generated                            Buck, Relay, Yarn and others
+#   Code generated ... DO NOT EDIT.       the Go convention (go generate)
+#   <auto-generated>                      .NET tools and T4 templates
+#   Generated by the protocol buffer compiler.  DO NOT EDIT!
+HEADER_BYTES = 1024
+GENERATED_MARKERS = re.compile(
+    rb'@generated\b|Code generated [^\n]*DO NOT EDIT|<auto-generated[ />]|Generated by the protocol buffer compiler'
+)
+
+# Skip reasons, as reported in the per-repository stats
+TOO_LARGE = 'too_large'
+BINARY = 'binary'
+GENERATED = 'generated'
+MINIFIED = 'minified'
+
+
+def sniff(head, size, max_file_bytes=None):
+    """Return why a file should not be counted, or None to count it.
+
+    `head` is the first SNIFF_BYTES (or fewer) bytes of the file and `size`
+    its full size, so the decision never needs the whole file in memory.
+    """
+    if max_file_bytes and size > max_file_bytes:
+        return TOO_LARGE
+    if b'\x00' in head:
+        return BINARY
+    if GENERATED_MARKERS.search(head, 0, HEADER_BYTES):
+        return GENERATED
+    if len(head) / (head.count(b'\n') + 1) > MAX_AVERAGE_LINE_LENGTH:
+        return MINIFIED
+    return None
@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from API.utils.ContentSniffer import SNIFF_BYTES, sniff
+from API.utils.LineClassifier import classify
+
+# Files are shipped to the pool in batches so each round trip carries enough
+# work to amortize pickling and IPC
+BATCH_MAX_FILES = 256
+BATCH_MAX_BYTES = 4 * 1024 * 1024
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def git_blob_sha(data):
+    """The SHA git gives a file with these contents, as listed by GitHub's
+    compare API."""
+    sha = hashlib.sha1(b'blob %d\x00' % len(data))
+    sha.update(data)
+    return sha.hexdigest()
+
+
+def skipped(path, reason):
+    return path, '', '', 0, 0, 0, reason
+
+
+def count_files(batch, max_file_bytes=None):
+    """Pool task: read and classify a batch of (path, ext) files from disk.
+
+    Returns (path, blob_sha, language, loc, comments, blanks, skip_reason)
+    per file. Only the head of a file is read until the sniffer has
+    accepted it; rejected files come back with zero counts and the reason.
+    """
+    results = []
+    for path, ext in batch:
+        try:
+            with open(path, 'rb') as f:
+                head = f.read(SNIFF_BYTES)
+                reason = sniff(head, os.fstat(f.fileno()).st_size, max_file_bytes)
+                if reason:
+                    results.append(skipped(path, reason))
+                    continue
+                data = head + f.read()
+        except OSError as e:
+            logging.error(f"Error processing file {path}: {e}")
+            continue
+        results.append((path, git_blob_sha(data)) + classify(data, ext) + ('',))
+    return results
+
+
+def count_blobs(batch, max_file_bytes=None):
+    """Pool task: classify a batch of (name, ext, data) in-memory files."""
+    results = []
+    for name, ext, data in batch:
+        reason = sniff(data[:SNIFF_BYTES], len(data), max_file_bytes)
+        if reason:
+            results.append(skipped(name, reason))
+        else:
+            results.append((name, git_blob_sha(data)) + classify(data, ext) + ('',))
+    return results
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from django.conf import settings
+            # Spawn rather than fork: the parent runs an event loop thread
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.COUNTING_PROCESSES or os.cpu_count(),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def iter_batches(items, size_of):
+    batch = []
+    batch_bytes = 0
+    for item in items:
+        batch.append(item)
+        batch_bytes += size_of(item)
+        if len(batch) >= BATCH_MAX_FILES or batch_bytes >= BATCH_MAX_BYTES:
+            yield batch
+            batch = []
+            batch_bytes = 0
+    if batch:
+        yield batch
+
+
+def run_batches(task, batches):
+    """Run `task` over each batch in the process pool, yielding per-file results.
+
+    Blocking; call it from a worker thread, not the event loop. At most two
+    batches per pool process are in flight, so memory stays bounded however
+    large the repository is. A repository that fits in a single batch is
+    counted inline, which is cheaper than the round trip.
+    """
+    batches = iter(batches)
+    first = next(batches, None)
+    if first is None:
+        return
+    second = next(batches, None)
+    if second is None:
+        yield from task(first)
+        return
+
+    pool = get_pool()
+    max_in_flight = pool._max_workers * 2
+    pending = {pool.submit(task, first), pool.submit(task, second)}
+    try:
+        for batch in batches:
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+            pending.add(pool.submit(task, batch))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+    finally:
+        for future in pending:
+            future.cancel()
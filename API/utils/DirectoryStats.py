@@ -0,0 +1,87 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from Models.models import DirectoryStat
+
+# Directory names seen by the analyses of this process and not yet written
+# to DirectoryStat. Analyses only add to these counters; they are merged into
+# the table in one batch at most every DIRECTORY_STATS_FLUSH_INTERVAL seconds
+# (or once DIRECTORY_STATS_MAX_PENDING names are waiting) and when a job ends.
+
+_counts = Counter()
+_repositories = Counter()
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def record(directory_counter):
+    """Add one repository's directory counts to the pending batch."""
+    with _lock:
+        _counts.update(directory_counter)
+        _repositories.update(directory_counter.keys())
+
+
+def flush_due():
+    with _lock:
+        pending = len(_counts)
+    if not pending:
+        return False
+    return pending >= settings.DIRECTORY_STATS_MAX_PENDING \
+        or time.monotonic() - _last_flush >= settings.DIRECTORY_STATS_FLUSH_INTERVAL
+
+
+def upsert_sql():
+    table = connection.ops.quote_name(DirectoryStat._meta.db_table)
+    name, count, repositories, date_updated = (
+        connection.ops.quote_name(DirectoryStat._meta.get_field(field).column)
+        for field in ('name', 'count', 'repositories', 'date_updated')
+    )
+    # Adds to the stored totals in the database, so concurrent flushes from
+    # several workers never lose each other's counts
+    return (
+        f"INSERT INTO {table} ({name}, {count}, {repositories}, {date_updated}) VALUES (%s, %s, %s, %s) "
+        f"ON CONFLICT ({name}) DO UPDATE SET "
+        f"{count} = {table}.{count} + excluded.{count}, "
+        f"{repositories} = {table}.{repositories} + excluded.{repositories}, "
+        f"{date_updated} = excluded.{date_updated}"
+    )
+
+
+def flush():
+    """Merge the pending counts into DirectoryStat."""
+    global _last_flush
+    with _lock:
+        counts = Counter(_counts)
+        repositories = Counter(_repositories)
+        _counts.clear()
+        _repositories.clear()
+        _last_flush = time.monotonic()
+    if not counts:
+        return
+
+    now = timezone.now()
+    rows = [(name[:255], count, repositories[name], now) for name, count in counts.items()]
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(upsert_sql(), rows)
+    except Exception as e:
+        logging.error(f"Failed to save directory statistics: {e}")
+        # Keep them for the next flush
+        with _lock:
+            _counts.update(counts)
+            _repositories.update(repositories)
+        return
+    logging.info(f"Saved statistics of {len(rows)} directory names")
+
+
+def get_common_directories(limit):
+    return list(
+        DirectoryStat.objects.order_by('-repositories', '-count', 'name')
+        .values('name', 'count', 'repositories')[:limit]
+    )
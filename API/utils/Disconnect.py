@@ -0,0 +1,47 @@
+import asyncio
+import contextlib
+
+# Django 4.2 stops reading from the ASGI connection once it has the request
+# body, so it never sees a client hang up and keeps iterating a streaming
+# response until it ends on its own. This wrapper listens for the disconnect
+# itself and cancels the request, which raises CancelledError inside the
+# streaming generator.
+
+
+class CancelOnDisconnect:
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.application(scope, receive, send)
+
+        body_received = asyncio.Event()
+
+        async def receive_body():
+            message = await receive()
+            if message['type'] != 'http.request' or not message.get('more_body', False):
+                body_received.set()
+            return message
+
+        async def watch_disconnect():
+            await body_received.wait()
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    request.cancel()
+                    return
+
+        request = asyncio.ensure_future(self.application(scope, receive_body, send))
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await request
+        except asyncio.CancelledError:
+            # Only swallow the cancellation we caused; a cancelled server
+            # task must still propagate
+            if not watcher.done():
+                raise
+        finally:
+            watcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await watcher
@@ -0,0 +1,26 @@
+import asyncio
+import threading
+
+# A single event loop running in a daemon thread, shared by every request in
+# this process. Sync views hand coroutines to it instead of spinning up a
+# loop of their own per repository.
+_loop = None
+_lock = threading.Lock()
+
+
+def get_event_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name='analysis-event-loop', daemon=True)
+            thread.start()
+    return _loop
+
+
+def submit(coro):
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop())
+
+
+def run(coro, timeout=None):
+    return submit(coro).result(timeout)
@@ -0,0 +1,181 @@
+import asyncio
+import atexit
+import logging
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+import aiohttp
+from django.conf import settings
+
+from API.utils.Metrics import GITHUB_REQUESTS, GITHUB_RETRIES
+from API.utils.RateLimits import get_token_pool
+
+# One pooled session per event loop. In practice that is the shared analysis
+# loop, so keep-alive connections and resolved DNS entries are reused by
+# every analyzer in the process.
+_sessions = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+RETRY_STATUSES = {500, 502, 503, 504}
+# GitHub asks to wait at least a minute after a secondary rate limit that
+# comes without a Retry-After header
+SECONDARY_LIMIT_BACKOFF = 60
+
+
+def github_headers(token=None, accept=None):
+    headers = {}
+    if token:
+        headers['Authorization'] = f'token {token}'
+    if accept:
+        headers['Accept'] = accept
+    return headers
+
+
+def _create_session():
+    connector = aiohttp.TCPConnector(
+        limit=settings.HTTP_POOL_LIMIT,
+        limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=settings.HTTP_TOTAL_TIMEOUT,
+        connect=settings.HTTP_CONNECT_TIMEOUT,
+        sock_read=settings.HTTP_READ_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+def get_session():
+    loop = asyncio.get_running_loop()
+    with _lock:
+        session = _sessions.get(loop)
+        if session is None or session.closed:
+            session = _create_session()
+            _sessions[loop] = session
+    return session
+
+
+def close_sessions(timeout=5):
+    with _lock:
+        sessions = list(_sessions.items())
+        _sessions.clear()
+
+    for loop, session in sessions:
+        if session.closed or loop.is_closed():
+            continue
+        try:
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(session.close(), loop).result(timeout)
+            else:
+                loop.run_until_complete(session.close())
+        except Exception as e:
+            logging.error(f"Failed to close HTTP session: {e}")
+    if sessions:
+        logging.info(f"Closed {len(sessions)} HTTP session(s)")
+
+
+atexit.register(close_sessions)
+
+
+def backoff(attempt, base=1.0, cap=60.0):
+    """Exponential backoff with jitter, so retries of concurrent requests spread out."""
+    return min(cap, base * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+async def acquire_token(pool, deadline):
+    logged = False
+    while True:
+        state, wait = pool.acquire()
+        if state is not None:
+            return state
+        if time.monotonic() + wait > deadline:
+            raise Exception(f"GitHub rate limit exhausted for the next {int(wait)}s")
+        if not logged:
+            logging.warning(f"GitHub rate limit reached, waiting up to {int(wait)}s")
+            logged = True
+        # A request finishing may free a token sooner than `wait`
+        await asyncio.sleep(min(wait, 1.0))
+
+
+async def rate_limited(response, state, pool, times_limited):
+    """If `response` was refused by a rate limit, block its token for as long
+    as GitHub asks and return True so the request is retried."""
+    if response.status not in (403, 429):
+        return False
+    retry_after = response.headers.get('Retry-After')
+    if retry_after is not None:
+        pool.block(state, float(retry_after))
+        return True
+    if response.headers.get('X-RateLimit-Remaining') == '0':
+        # Spent until the reset; at least a second in case clocks disagree
+        reset = float(response.headers.get('X-RateLimit-Reset', 0))
+        pool.block(state, max(1.0, reset - time.time()))
+        return True
+    if 'rate limit' in (await response.text()).lower():
+        pool.block(state, SECONDARY_LIMIT_BACKOFF * 2 ** min(times_limited, 4) * random.uniform(1.0, 1.5))
+        return True
+    return False
+
+
+@asynccontextmanager
+async def github_request(url, accept=None, params=None, headers=None):
+    """GET `url` from GitHub on the shared session and yield the response.
+
+    Requests are spread over the GITHUB_TOKENS pool and wait for budget
+    instead of failing: a spent or secondary-limited token is set aside
+    until GitHub allows it again, and 5xx or connection errors are retried
+    with backoff up to GITHUB_MAX_RETRIES times. Only when no token frees
+    up within GITHUB_RATE_LIMIT_MAX_WAIT seconds does it raise. Any other
+    status is yielded as is for the caller to handle.
+    """
+    session = get_session()
+    pool = get_token_pool()
+    deadline = time.monotonic() + settings.GITHUB_RATE_LIMIT_MAX_WAIT
+    attempt = 0
+    times_limited = 0
+    while True:
+        state = await acquire_token(pool, deadline)
+        try:
+            response = await session.get(url, params=params, headers={**github_headers(state.token, accept), **(headers or {})})
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            pool.release(state)
+            attempt += 1
+            if attempt > settings.GITHUB_MAX_RETRIES:
+                raise
+            GITHUB_RETRIES.inc(reason='connection_error')
+            delay = backoff(attempt)
+            logging.warning(f"GitHub request {url} failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            pool.release(state)
+            raise
+        pool.release(state, response.headers)
+        GITHUB_REQUESTS.inc(status=response.status)
+
+        try:
+            if await rate_limited(response, state, pool, times_limited):
+                logging.warning(f"GitHub rate limited {url} ({response.status}), rescheduling")
+                times_limited += 1
+                GITHUB_RETRIES.inc(reason='rate_limit')
+                response.release()
+                continue
+            if response.status in RETRY_STATUSES and attempt < settings.GITHUB_MAX_RETRIES:
+                attempt += 1
+                GITHUB_RETRIES.inc(reason='server_error')
+                delay = backoff(attempt)
+                logging.warning(f"GitHub returned {response.status} for {url}, retrying in {delay:.1f}s")
+                response.release()
+                await asyncio.sleep(delay)
+                continue
+        except BaseException:
+            response.release()
+            raise
+        break
+
+    async with response:
+        yield response
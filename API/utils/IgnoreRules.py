@@ -0,0 +1,133 @@
+import re
+from functools import lru_cache
+
+GLOB_CHARS = ('*', '?', '[')
+# Marks the end of a rule in the tries below
+END = object()
+
+
+def glob_to_regex(pattern):
+    """Translate a gitignore-style glob to a regex over a repository path.
+
+    A pattern without a slash matches a file or directory name at any depth;
+    one with a slash is anchored at the repository root. `**` spans
+    directories, `*` and `?` do not. Anything under a matched directory
+    matches too.
+    """
+    pattern = pattern.strip('/')
+    if pattern.startswith('**/'):
+        prefix, pattern = '(?:.*/)?', pattern[3:]
+    elif '/' in pattern:
+        prefix = ''
+    else:
+        prefix = '(?:.*/)?'
+
+    regex = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith('**', i):
+            regex.append('.*')
+            i += 2
+            continue
+        if char == '*':
+            regex.append('[^/]*')
+        elif char == '?':
+            regex.append('[^/]')
+        elif char == '[':
+            end = pattern.find(']', i + 1)
+            if end < 0:
+                regex.append(re.escape(char))
+            else:
+                regex.append('[' + pattern[i + 1:end].replace('!', '^', 1) + ']')
+                i = end
+        else:
+            regex.append(re.escape(char))
+        i += 1
+    return prefix + ''.join(regex) + '(?:/.*)?'
+
+
+class IgnoreMatcher:
+    """Decides whether a repository path is excluded by a set of ignore rules.
+
+    - Directory names (`node_modules`) and nested directory paths
+      (`bootstrap/cache`) match a run of directories at any depth; they
+      are kept in a trie of path segments.
+    - Extensions match the end of a file name and may have several dots
+      (`.min.js`); they are kept in a trie of reversed name components.
+    - Entries of either kind containing `*`, `?` or `[` are gitignore-style
+      globs, compiled into a single regex.
+
+    Paths are repository-relative and use forward slashes.
+    """
+
+    def __init__(self, ignore_dirs=(), ignore_extensions=()):
+        self.dir_trie = {}
+        self.extension_trie = {}
+        globs = []
+
+        for rule in ignore_dirs:
+            if any(char in rule for char in GLOB_CHARS):
+                globs.append(rule)
+                continue
+            node = self.dir_trie
+            for segment in rule.strip('/').split('/'):
+                node = node.setdefault(segment, {})
+            node[END] = True
+
+        for rule in ignore_extensions:
+            if any(char in rule for char in GLOB_CHARS):
+                globs.append(rule)
+                continue
+            node = self.extension_trie
+            for component in reversed(rule.lstrip('.').split('.')):
+                node = node.setdefault(component, {})
+            node[END] = True
+
+        self.glob_pattern = re.compile('|'.join(glob_to_regex(glob) for glob in globs)) if globs else None
+        # Every file in a directory asks about the same directory again
+        self.ignores_dir = lru_cache(maxsize=4096)(self._ignores_dir)
+
+    def _ignores_dir(self, dir_path):
+        """Whether the directory at `dir_path` (e.g. 'app/bootstrap/cache') is excluded."""
+        if not dir_path:
+            return False
+        segments = dir_path.split('/')
+        for start in range(len(segments)):
+            node = self.dir_trie
+            for segment in segments[start:]:
+                node = node.get(segment)
+                if node is None:
+                    break
+                if END in node:
+                    return True
+        return self.glob_pattern is not None and self.glob_pattern.fullmatch(dir_path) is not None
+
+    def ignores_name(self, name):
+        """Whether a file name ends with an ignored extension."""
+        node = self.extension_trie
+        # The first component is the stem, never an extension
+        for component in reversed(name.split('.')[1:]):
+            node = node.get(component)
+            if node is None:
+                return False
+            if END in node:
+                return True
+        return False
+
+    def ignores_file(self, path):
+        """Whether the file at `path` is excluded by its name or any of its directories."""
+        dir_path, _, name = path.rpartition('/')
+        if self.ignores_name(name) or self.ignores_dir(dir_path):
+            return True
+        return self.glob_pattern is not None and self.glob_pattern.fullmatch(path) is not None
+
+
+@lru_cache(maxsize=64)
+def _get_matcher(ignore_dirs, ignore_extensions):
+    return IgnoreMatcher(ignore_dirs, ignore_extensions)
+
+
+def get_matcher(ignore_dirs, ignore_extensions):
+    """Return the shared matcher for this rule set, compiling it on first use."""
+    return _get_matcher(frozenset(ignore_dirs or ()), frozenset(ignore_extensions or ()))
@@ -0,0 +1,254 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from Models.models import AnalysisJob, AnalysisJobEvent, UserRecord, UserRepository
+from API.utils.AnalysisPipeline import iter_analyses
+from API.utils.DirectoryStats import flush as flush_directory_stats
+from API.utils.Metrics import JOBS_IN_PROGRESS, STAGE_SECONDS, flush as flush_metrics
+from API.utils.RepositoryCache import rules_hash, write_transaction
+from API.utils.RepositoryListing import iter_repositories
+
+# Profile analyses run in `manage.py run_analysis_worker`, not in the web
+# process. Jobs and their progress events live in the database, so any web
+# worker can tail a job and a job outlives the request that queued it.
+
+
+def get_active_job(username, rules=None):
+    jobs = AnalysisJob.objects.alias(username_lower=Lower('username')).filter(
+        username_lower=username.lower(), status__in=AnalysisJob.ACTIVE_STATUSES
+    )
+    if rules is not None:
+        jobs = jobs.filter(rules_hash=rules)
+    return jobs.order_by('date_created').first()
+
+
+def enqueue(username, ignore_dirs, ignore_extensions):
+    """Queue an analysis for `username`, or return the job already queued or
+    running for the same user and ignore rules."""
+    rules = rules_hash(ignore_dirs, ignore_extensions)
+    job = get_active_job(username, rules)
+    if job is not None:
+        return job
+    try:
+        with transaction.atomic():
+            job = AnalysisJob.objects.create(
+                username=username,
+                rules_hash=rules,
+                ignore_dirs=sorted(ignore_dirs),
+                ignore_extensions=sorted(ignore_extensions),
+            )
+    except IntegrityError:
+        # Another request queued the same job in the meantime
+        job = get_active_job(username, rules)
+        if job is None:
+            raise
+        return job
+    logging.info(f"Queued analysis job {job.id} for {username}")
+    return job
+
+
+def claim_job(worker, job_id=None):
+    """Move the oldest queued job (only job `job_id`, if given) to running
+    for `worker`, or return None.
+
+    The status check in the UPDATE makes the claim safe between workers
+    without row locks, which SQLite does not have.
+    """
+    while True:
+        queued = AnalysisJob.objects.filter(status=AnalysisJob.QUEUED)
+        if job_id is not None:
+            queued = queued.filter(id=job_id)
+        job = queued.order_by('date_created').first()
+        if job is None:
+            return None
+        now = timezone.now()
+        claimed = AnalysisJob.objects.filter(id=job.id, status=AnalysisJob.QUEUED).update(
+            status=AnalysisJob.RUNNING,
+            worker=worker,
+            heartbeat=now,
+            date_started=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def add_event(job, data):
+    """Append a progress event to `job`.
+
+    Returns False without writing anything once the job is no longer running
+    on this worker, e.g. after it was requeued as stale.
+    """
+    with transaction.atomic():
+        owned = AnalysisJob.objects.filter(id=job.id, worker=job.worker, status=AnalysisJob.RUNNING).update(
+            last_seq=job.last_seq + 1,
+            processed_repos=job.processed_repos,
+            total_repos=job.total_repos,
+            heartbeat=timezone.now(),
+        )
+        if not owned:
+            return False
+        job.last_seq += 1
+        AnalysisJobEvent.objects.create(job=job, seq=job.last_seq, attempt=job.attempts, data=data)
+    return True
+
+
+def finish_job(job, status, error=''):
+    job.status = status
+    job.error = error
+    job.date_finished = timezone.now()
+    AnalysisJob.objects.filter(id=job.id, worker=job.worker, status=AnalysisJob.RUNNING).update(
+        status=status, error=error, date_finished=job.date_finished
+    )
+
+
+def release_job(job):
+    """Put a job this worker is giving up on back in the queue without
+    counting the attempt."""
+    AnalysisJob.objects.filter(id=job.id, worker=job.worker, status=AnalysisJob.RUNNING).update(
+        status=AnalysisJob.QUEUED, worker='', attempts=F('attempts') - 1
+    )
+
+
+def requeue_stale_jobs():
+    """Requeue running jobs whose worker stopped sending heartbeats.
+
+    A job that has already used up its attempts is failed instead. The
+    events of a requeued job's abandoned attempt are deleted: the next
+    attempt counts its repositories from the start again.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_STALE_AFTER)
+    stale = AnalysisJob.objects.filter(status=AnalysisJob.RUNNING, heartbeat__lt=cutoff)
+    failed = stale.filter(attempts__gte=settings.JOB_MAX_ATTEMPTS).update(
+        status=AnalysisJob.FAILED, error='Worker stopped responding', date_finished=timezone.now()
+    )
+    with write_transaction(AnalysisJob):
+        requeue = list(stale.filter(attempts__lt=settings.JOB_MAX_ATTEMPTS).values_list('id', flat=True))
+        requeued = AnalysisJob.objects.filter(id__in=requeue).update(status=AnalysisJob.QUEUED, worker='')
+        AnalysisJobEvent.objects.filter(job_id__in=requeue).delete()
+    if failed or requeued:
+        logging.warning(f"Requeued {requeued} and failed {failed} stale analysis jobs")
+    return requeued
+
+
+def prune_finished_jobs(batch_size=1000):
+    """Delete jobs that finished more than JOB_RETENTION seconds ago, with
+    their events. Returns the number of jobs deleted."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_RETENTION)
+    finished = AnalysisJob.objects.exclude(status__in=AnalysisJob.ACTIVE_STATUSES).filter(date_finished__lt=cutoff)
+    deleted = 0
+    while True:
+        # In batches, so the write lock is never held for long
+        batch = list(finished.values_list('id', flat=True)[:batch_size])
+        if not batch:
+            break
+        with write_transaction(AnalysisJob):
+            AnalysisJobEvent.objects.filter(job_id__in=batch).delete()
+            AnalysisJob.objects.filter(id__in=batch).delete()
+        deleted += len(batch)
+    if deleted:
+        logging.info(f"Deleted {deleted} analysis jobs finished before {cutoff}")
+    return deleted
+
+
+def keep_alive(job, stop):
+    """Thread target refreshing the heartbeat while a single repository takes
+    longer than the stale timeout."""
+    try:
+        while not stop.wait(settings.JOB_HEARTBEAT_INTERVAL):
+            AnalysisJob.objects.filter(id=job.id, status=AnalysisJob.RUNNING).update(heartbeat=timezone.now())
+    finally:
+        connection.close()
+
+
+def record(job, data):
+    if not add_event(job, data):
+        raise Exception(f"Analysis job {job.id} is no longer assigned to {job.worker}")
+
+
+def run_job(job):
+    """Analyze every repository of the job's user, recording progress events
+    and finally the UserRecord."""
+    ignore_dirs = set(job.ignore_dirs)
+    ignore_extensions = set(job.ignore_extensions)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=keep_alive, args=(job, stop), daemon=True)
+    heartbeat.start()
+    JOBS_IN_PROGRESS.inc()
+    try:
+        repositories = []
+        lines_of_code = 0
+        lines_of_code_per_language = {}
+        # Results of a previous attempt are not reused; counts start over
+        job.processed_repos = 0
+
+        analyses = iter_analyses(
+            job.username, iter_repositories(job.username), ignore_dirs, ignore_extensions,
+            settings.ANALYSIS_CONCURRENCY, settings.MAX_REPOSITORY_SIZE
+        )
+        for repository, loc, error, total_repos in analyses:
+            # Only the listing fields the profile keeps, not the whole GitHub JSON
+            repositories.append(UserRepository(
+                name=repository['name'],
+                size=repository.get('size') or 0,
+                fork=bool(repository.get('fork')),
+                default_branch=repository.get('default_branch') or '',
+                pushed_at=parse_datetime(repository['pushed_at']) if repository.get('pushed_at') else None,
+                lines_of_code=loc.get('loc', 0) if error is None else None,
+            ))
+            job.processed_repos += 1
+            job.total_repos = total_repos
+            record(job, {
+                'type': 'progress', 'repo': repository['name'], 'processedRepos': job.processed_repos, 'totalRepos': total_repos,
+                'skippedFiles': loc.get('skipped', {}) if loc else {},
+            })
+
+            if error is not None:
+                record(job, {'type': 'error', 'message': str(error)})
+                continue
+
+            lines_of_code += loc.get('loc', 0)
+            for lang, count in loc.get('locByLangs', {}).items():
+                lines_of_code_per_language[lang] = lines_of_code_per_language.get(lang, 0) + count
+
+        with STAGE_SECONDS.time(stage='db_save'), write_transaction(UserRecord):
+            # Replace the user's row in place, so the profile never drops
+            # off the leaderboard while it is refreshed
+            user, _ = UserRecord.objects.update_or_create(
+                username_key=job.username.lower(),
+                defaults={
+                    'username': job.username,
+                    'lines_of_code': lines_of_code,
+                    'lines_of_code_per_language': lines_of_code_per_language,
+                    'date_requested': timezone.now(),
+                },
+            )
+            UserRepository.objects.filter(user=user).delete()
+            for repository in repositories:
+                repository.user = user
+            UserRepository.objects.bulk_create(repositories, ignore_conflicts=True)
+            record(job, {'type': 'result', 'total_lines_of_code': lines_of_code, 'lines_of_code_per_language': lines_of_code_per_language})
+            finish_job(job, AnalysisJob.SUCCEEDED)
+        logging.info(f"Analysis job {job.id} for {job.username} finished: {lines_of_code} lines")
+
+    except Exception as e:
+        logging.error(f"Analysis job {job.id} for {job.username} failed: {e}")
+        add_event(job, {'type': 'error', 'message': str(e)})
+        finish_job(job, AnalysisJob.FAILED, str(e))
+
+    finally:
+        stop.set()
+        heartbeat.join()
+        JOBS_IN_PROGRESS.dec()
+        flush_metrics()
+        flush_directory_stats()
+
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from bisect import bisect_right
+from operator import itemgetter
+
+from django.conf import settings
+
+from Models.models import AnalysisJob, AnalysisJobEvent
+
+# One poller per job and event loop: however many clients watch a profile,
+# the database is asked for new events once per JOB_POLL_INTERVAL and every
+# viewer is fed from the same in-memory list. Under ASGI a process has a
+# single loop; keying on it keeps a feed's Event and task on the loop that
+# created them should requests ever run on separate loops (WSGI).
+_feeds = {}  # (loop, job id) -> JobFeed
+
+
+class JobFeed:
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.events = []  # (seq, data) of the latest attempt
+        self.attempt = 0
+        self.status = None
+        self.error = None
+        self.viewers = 0
+        # Replaced on every change; viewers wait on the one they last saw
+        self.changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self.poll())
+
+    def notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    async def poll(self):
+        last_seq = 0
+        try:
+            while True:
+                job = await AnalysisJob.objects.only('status', 'last_seq').aget(id=self.job_id)
+                events = AnalysisJobEvent.objects.filter(job_id=self.job_id, seq__gt=last_seq).values_list('seq', 'attempt', 'data')
+                new_events = [event async for event in events]
+                for seq, attempt, data in new_events:
+                    if attempt > self.attempt:
+                        # The job was requeued: its earlier attempt is not replayed
+                        self.attempt = attempt
+                        self.events = []
+                    self.events.append((seq, data))
+                    last_seq = seq
+                if job.is_finished and last_seq >= job.last_seq:
+                    self.status = job.status
+                if new_events or self.status is not None:
+                    self.notify()
+                if self.status is not None:
+                    return
+                await asyncio.sleep(settings.JOB_POLL_INTERVAL)
+        except Exception as e:
+            logging.error(f"Failed to poll analysis job {self.job_id}: {e}")
+            self.error = e
+            self.notify()
+
+
+async def follow(job, after=0):
+    """Yield (seq, data) for every event of `job` after event `after`, as
+    they arrive.
+
+    Ends once the job has finished and all its events were yielded, leaving
+    its final status in `job.status`.
+    """
+    key = (asyncio.get_running_loop(), job.id)
+    feed = _feeds.get(key)
+    if feed is None:
+        feed = _feeds[key] = JobFeed(job.id)
+    feed.viewers += 1
+    try:
+        last_seq = after
+        while True:
+            changed = feed.changed
+            # Sequence numbers increase, with a gap where a requeued job's
+            # abandoned attempt was dropped
+            events = feed.events
+            index = bisect_right(events, last_seq, key=itemgetter(0))
+            while index < len(events) and events is feed.events:
+                last_seq = events[index][0]
+                yield events[index]
+                index += 1
+            if events is not feed.events:
+                continue
+            if feed.error is not None:
+                raise Exception(f"Lost track of analysis job {job.id}: {feed.error}")
+            if feed.status is not None:
+                job.status = feed.status
+                return
+            await changed.wait()
+    finally:
+        feed.viewers -= 1
+        if feed.viewers == 0 and _feeds.get(key) is feed:
+            feed.task.cancel()
+            del _feeds[key]
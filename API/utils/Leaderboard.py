@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from Models.models import UserRecord, LanguageStat
+from API.constants.Languages import extension_languages
+
+PAGE_SIZE = 10
+COUNT_CACHE_KEY = 'leaderboard:count'
+TOP_PAGE_CACHE_KEY = 'leaderboard:top'
+LANGUAGE_TOTALS_CACHE_KEY = 'leaderboard:languages'
+
+# Only the columns the leaderboard shows
+FIELDS = ('id', 'username', 'lines_of_code', 'lines_of_code_per_language')
+
+
+def encode_cursor(row):
+    return f"{row.lines_of_code}:{row.id}"
+
+
+def decode_cursor(cursor):
+    try:
+        lines_of_code, user_id = cursor.split(':')
+        return int(lines_of_code), int(user_id)
+    except ValueError:
+        raise Exception(f"Invalid leaderboard cursor {cursor!r}")
+
+
+def invalidate():
+    cache.delete_many([COUNT_CACHE_KEY, TOP_PAGE_CACHE_KEY, LANGUAGE_TOTALS_CACHE_KEY])
+
+
+def save_language_stats(user_record):
+    """Mirror a UserRecord's per-language totals into LanguageStat rows."""
+    with transaction.atomic():
+        LanguageStat.objects.filter(user=user_record).delete()
+        LanguageStat.objects.bulk_create([
+            LanguageStat(user=user_record, language=language, lines_of_code=count)
+            for language, count in (user_record.lines_of_code_per_language or {}).items()
+            if count
+        ])
+
+
+async def get_count():
+    count = await cache.aget(COUNT_CACHE_KEY)
+    if count is None:
+        count = await UserRecord.objects.acount()
+        await cache.aset(COUNT_CACHE_KEY, count, settings.LEADERBOARD_CACHE_TTL)
+    return count
+
+
+def seek(rows, cursor):
+    """Keyset pagination: continue strictly after the last row of the
+    previous page, so the index seeks instead of skipping rows."""
+    if cursor is None:
+        return rows
+    lines_of_code, row_id = decode_cursor(cursor)
+    return rows.filter(Q(lines_of_code__lt=lines_of_code) | Q(lines_of_code=lines_of_code, id__lt=row_id))
+
+
+async def fetch_page(cursor=None, offset=0):
+    users = seek(UserRecord.objects.only(*FIELDS).order_by('-lines_of_code', '-id'), cursor)
+    # One extra row tells whether there is a next page
+    users = [user async for user in users[offset:offset + PAGE_SIZE + 1]]
+    next_cursor = encode_cursor(users[PAGE_SIZE - 1]) if len(users) > PAGE_SIZE else None
+    users_list = [
+        {
+            'username': user.username,
+            'lines_of_code': user.lines_of_code,
+            'lines_of_code_per_language': user.lines_of_code_per_language
+        } for user in users[:PAGE_SIZE]
+    ]
+    return users_list, next_cursor
+
+
+async def get_page(cursor=None, page=1):
+    """Return (users, next_cursor) for the page after `cursor`.
+
+    Without a cursor, `page` falls back to offset pagination for older
+    clients; the first page is cached.
+    """
+    if cursor is not None:
+        return await fetch_page(cursor=cursor)
+    if page > 1:
+        return await fetch_page(offset=(page - 1) * PAGE_SIZE)
+
+    top = await cache.aget(TOP_PAGE_CACHE_KEY)
+    if top is None:
+        top = await fetch_page()
+        await cache.aset(TOP_PAGE_CACHE_KEY, top, settings.LEADERBOARD_CACHE_TTL)
+    return top
+
+
+async def get_language_totals():
+    """Lines of code and number of users per language, largest first."""
+    totals = await cache.aget(LANGUAGE_TOTALS_CACHE_KEY)
+    if totals is None:
+        rows = (
+            LanguageStat.objects.values('language')
+            .annotate(lines_of_code=Sum('lines_of_code'), users=Count('id'))
+            .order_by('-lines_of_code')
+        )
+        totals = [row async for row in rows]
+        await cache.aset(LANGUAGE_TOTALS_CACHE_KEY, totals, settings.LEADERBOARD_CACHE_TTL)
+    return totals
+
+
+async def get_language_page(language, cursor=None, page=1):
+    """Return (language, users, next_cursor, count) for one language's ranking.
+
+    `language` may be a language name or a file extension such as `.py`.
+    """
+    language = extension_languages.get(language, language)
+    stats = LanguageStat.objects.filter(language=language).select_related('user').only(
+        'id', 'lines_of_code', 'user__username', 'user__lines_of_code'
+    ).order_by('-lines_of_code', '-id')
+    offset = 0 if cursor is not None else (page - 1) * PAGE_SIZE
+    stats = [stat async for stat in seek(stats, cursor)[offset:offset + PAGE_SIZE + 1]]
+    next_cursor = encode_cursor(stats[PAGE_SIZE - 1]) if len(stats) > PAGE_SIZE else None
+    users_list = [
+        {
+            'username': stat.user.username,
+            'lines_of_code': stat.lines_of_code,
+            'total_lines_of_code': stat.user.lines_of_code,
+        } for stat in stats[:PAGE_SIZE]
+    ]
+    count = next((row['users'] for row in await get_language_totals() if row['language'] == language), 0)
+    return language, users_list, next_cursor, count
@@ -0,0 +1,188 @@
+import re
+
+from API.constants.Languages import languages, extension_languages
+
+# Comment text is replaced by this marker (one per line it touches) before
+# lines are counted, so a single pass of regexes can tell code, comment and
+# blank lines apart without looping over lines in Python.
+MARKER = b'\x00'
+
+# Line patterns run over a buffer framed as b'\n' + data + b'\n' and start
+# with a literal newline, which lets the regex engine jump from line to line
+# instead of testing a MULTILINE '^' at every byte. Indentation is matched
+# possessively so a line that does not qualify fails without backtracking
+# through it, and each match is the single b'\n', which findall does not copy.
+_BLANK_LINE = re.compile(rb'\n(?=[ \t\r\f\v]*+\n)')
+
+# Fallback for unknown extensions: a line is a comment if it starts with one
+# of the usual prefixes, with no multi-line state
+_GENERIC_COMMENT_LINE = re.compile(rb'\n(?=[ \t\r\f\v]*+(?:#|//|/\*|\*))')
+
+
+def _frame_lines(data):
+    """Return the line count and the buffer framed for the line patterns."""
+    if data.endswith(b'\n'):
+        data = data[:-1]
+    return data.count(b'\n') + 1, b'\n' + data + b'\n'
+
+
+_NON_BLANK_SEGMENT = re.compile(rb'[^\n]*[^ \t\r\f\v\n][^\n]*')
+
+
+def _mask_span(text, mask):
+    """Replace every non-blank line of `text` with `mask`, keeping newlines."""
+    if b'\n' not in text:
+        return mask
+    return _NON_BLANK_SEGMENT.sub(mask, text)
+
+
+class LanguageClassifier:
+    """Counts code, comment and blank lines for one language.
+
+    Python only runs per multi-line construct, never per line or per string:
+
+    1. The block-comment state machine jumps between openers of multi-line
+       forms (block comments, docstrings, multi-line strings) with a regex
+       search; every alternative starts with a literal, so the engine skips
+       straight to candidate bytes. A candidate preceded on its line by an
+       open string or a line comment is not an opener. Otherwise its span
+       runs to the matching close token, and scanning resumes after it.
+    2. Comment spans, and docstrings that start a line, become one MARKER per
+       non-blank line; multi-line strings become code.
+    3. Blank and comment lines are then counted with one multiline regex
+       each over the whole buffer.
+
+    Files containing none of the multi-line openers skip steps 1 and 2.
+    """
+
+    def __init__(self, line_comments=(), block_comments=(), docstrings=(), strings=()):
+        self.spans = [(open_token.encode(), close_token.encode(), 'docstring') for open_token, close_token in docstrings]
+        docstring_opens = {open_token for open_token, _ in docstrings}
+        self.spans += [
+            (quote.encode(), quote.encode(), 'string')
+            for quote in strings if len(quote) > 1 and quote not in docstring_opens
+        ]
+        self.spans += [(open_token.encode(), close_token.encode(), 'block') for open_token, close_token in block_comments]
+        self.multiline_tokens = [open_token for open_token, _, _ in self.spans]
+        self.opener_pattern = None
+        if self.spans:
+            self.opener_pattern = re.compile(b'|'.join(re.escape(open_token) + b'()' for open_token, _, _ in self.spans))
+
+        self.quotes = [quote.encode() for quote in strings if len(quote) == 1]
+        self.inline_string_pattern = None
+        if self.quotes:
+            self.inline_string_pattern = re.compile(b'|'.join(
+                re.escape(quote) + rb'(?:\\.|(?!' + re.escape(quote) + rb')[^\\\n])*' + re.escape(quote)
+                for quote in self.quotes
+            ))
+
+        self.line_tokens = [token.encode() for token in line_comments]
+        # Anything in a prefix that could mean "inside a string or line comment"
+        hazards = self.quotes + self.line_tokens
+        self.prefix_hazard = re.compile(b'|'.join(re.escape(hazard) for hazard in hazards)) if hazards else None
+        # Blanks, then either a line comment, or markers and blanks up to a
+        # line comment or the end of the line
+        line_starts = b'|'.join(re.escape(token) for token in self.line_tokens)
+        comment_starts = line_starts + b'|' if line_starts else b''
+        self.comment_line_pattern = re.compile(
+            rb'\n(?=[ \t\r\f\v]*+(?:' + comment_starts + rb'\x00[ \t\r\f\v\x00]*+(?:' + comment_starts + rb'\n)))'
+        )
+
+    def opens_in_code(self, prefix):
+        """Whether a token preceded by `prefix` on its line sits outside strings and line comments."""
+        if self.prefix_hazard is None or not self.prefix_hazard.search(prefix):
+            return True
+        if self.inline_string_pattern is not None:
+            prefix = self.inline_string_pattern.sub(b'', prefix)
+        if any(quote in prefix for quote in self.quotes):
+            return False
+        return not any(token in prefix for token in self.line_tokens)
+
+    def mask_spans(self, data):
+        # Runs once per opener, so the lookups are hoisted out of the loop and
+        # the common cases (no string or line comment before the opener, a
+        # span on one line) are handled inline
+        search = self.opener_pattern.search
+        spans = self.spans
+        prefix_hazard = self.prefix_hazard
+        find = data.find
+        rfind = data.rfind
+        pieces = []
+        append = pieces.append
+        cursor = 0
+        position = 0
+        while True:
+            match = search(data, position)
+            if match is None:
+                break
+            start = match.start()
+            open_token, close_token, kind = spans[match.lastindex - 1]
+            line_start = rfind(b'\n', 0, start) + 1
+            prefix = data[line_start:start]
+            if prefix_hazard is not None and prefix_hazard.search(prefix) and not self.opens_in_code(prefix):
+                position = start + 1
+                continue
+
+            end = find(close_token, start + len(open_token))
+            end = len(data) if end < 0 else end + len(close_token)
+            if kind == 'string' or (kind == 'docstring' and prefix.strip()):
+                mask = b'"'
+            else:
+                mask = MARKER
+            append(data[cursor:start])
+            if find(b'\n', start, end) < 0:
+                append(mask)
+            else:
+                append(_mask_span(data[start:end], mask))
+            cursor = position = end
+
+        if not pieces:
+            return data
+        append(data[cursor:])
+        return b''.join(pieces)
+
+    def count(self, data):
+        if not data:
+            return 0, 0, 0
+        if any(token in data for token in self.multiline_tokens):
+            if MARKER in data:
+                data = data.replace(MARKER, b'\x01')
+            data = self.mask_spans(data)
+        total_lines, data = _frame_lines(data)
+        blank_lines = len(_BLANK_LINE.findall(data))
+        comment_lines = len(self.comment_line_pattern.findall(data))
+        return total_lines - blank_lines - comment_lines, comment_lines, blank_lines
+
+
+class GenericClassifier:
+    def count(self, data):
+        if not data:
+            return 0, 0, 0
+        total_lines, data = _frame_lines(data)
+        blank_lines = len(_BLANK_LINE.findall(data))
+        comment_lines = len(_GENERIC_COMMENT_LINE.findall(data))
+        return total_lines - blank_lines - comment_lines, comment_lines, blank_lines
+
+
+_classifiers = {
+    name: LanguageClassifier(
+        line_comments=language.get('line_comments', ()),
+        block_comments=language.get('block_comments', ()),
+        docstrings=language.get('docstrings', ()),
+        strings=language.get('strings', ()),
+    )
+    for name, language in languages.items()
+}
+_generic_classifier = GenericClassifier()
+
+
+def classify(data, ext):
+    """Return (language, loc, comments, blanks) for a file's bytes.
+
+    Files with an unregistered extension keep the raw suffix as their
+    language and fall back to prefix-based comment detection.
+    """
+    language = extension_languages.get(ext)
+    if language is None:
+        return (ext,) + _generic_classifier.count(data)
+    return (language,) + _classifiers[language].count(data)
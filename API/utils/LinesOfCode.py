@@ -1,165 +1,454 @@
 import os
 import shutil
-import aiohttp
-import aiofiles
+import time
 import asyncio
 import zipfile
 import logging
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 from collections import Counter
+from functools import partial
 import tempfile
-import io
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from API.utils.ContentSniffer import SNIFF_BYTES, TOO_LARGE, sniff
+from API.utils import DirectoryStats
+from API.utils.CountingEngine import count_blobs, count_files, iter_batches, run_batches
+from API.utils.EventLoop import run as run_on_event_loop
+from API.utils.HttpClient import github_request
+from API.utils.IgnoreRules import get_matcher
+from API.utils.Metrics import DOWNLOAD_BYTES, FILES, LINES, SKIPPED_FILES, STAGE_SECONDS
+from API.utils.ResponseCache import cached_get
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Archives are buffered in memory up to this size, then spilled to disk
+DEFAULT_SPOOL_THRESHOLD = 8 * 1024 * 1024
+# Changed files fetched at once during an incremental analysis
+BLOB_DOWNLOAD_CONCURRENCY = 8
+
 class RepoAnalyzer:
-    def __init__(self, username, repo_name, ignore_dirs=None, ignore_extensions=None):
+    def __init__(self, username, repo_name, ignore_dirs=None, ignore_extensions=None, in_memory=False,
+                 max_archive_bytes=None, spool_threshold=DEFAULT_SPOOL_THRESHOLD, repo_metadata=None):
         self.username = username
         self.repo_name = repo_name
-        self.repo_url_template = "https://github.com/{username}/{repo_name}/archive/refs/heads/{branch}.zip"
+        self.api_url = f"{settings.GITHUB_API_BASE}/repos/{username}/{repo_name}"
+        self.repo_url_template = settings.GITHUB_ARCHIVE_BASE + "/{username}/{repo_name}/archive/refs/heads/{branch}.zip"
+        self.commit_url_template = settings.GITHUB_ARCHIVE_BASE + "/{username}/{repo_name}/archive/{commit_sha}.zip"
         self.ignore_dirs = set(ignore_dirs) if ignore_dirs else set()
         self.ignore_extensions = set(ignore_extensions) if ignore_extensions else set()
-        self.clone_base_dir = tempfile.mkdtemp()
-        self.clone_dir = self.clone_base_dir  # Will be updated after extraction
-        self.directory_counter = Counter()
+        self.ignore_rules = get_matcher(self.ignore_dirs, self.ignore_extensions)
+        # In-memory mode counts lines straight from the zip members instead of
+        # extracting the archive to a temporary directory first
+        self.in_memory = in_memory
+        # Hard cap on the archive bytes actually received; None disables it
+        self.max_archive_bytes = max_archive_bytes
+        self.spool_threshold = spool_threshold
+        self.clone_base_dir = None  # Created on extraction
+        self.clone_dir = None  # Will be updated after extraction
+        # Repository-relative paths of the directories found, not ignored
+        self.directories = set()
+        # Metadata from the repository listing, when the caller already has it,
+        # saves a repos/{owner}/{repo} request per analysis
+        self.repo_metadata = repo_metadata or {}
+        self.default_branch = self.repo_metadata.get('default_branch')
+        self.commit_sha = None  # Set by get_head_sha; pins the download to that commit
+        # Repository-relative path -> (blob_sha, language, loc, comments, blanks,
+        # skip_reason) of every file, filled in by a full analysis
+        self.files = {}
+        # Files left out by the content sniffer, per reason
+        self.skipped = Counter()
         logging.info(f"Initialized RepoAnalyzer for {username}/{repo_name}")
 
     async def get_default_branch(self):
-        api_url = f"https://api.github.com/repos/{self.username}/{self.repo_name}"
-        headers = {}
-        token = os.getenv('GITHUB_TOKEN')
-        if token:
-            headers['Authorization'] = f'token {token}'
-        async with aiohttp.ClientSession() as session:
-            async with session.get(api_url, headers=headers) as response:
-                if response.status == 200:
-                    repo_info = await response.json()
-                    default_branch = repo_info.get('default_branch', 'master')
-                    logging.info(f"Default branch for {self.username}/{self.repo_name} is {default_branch}")
-                    return default_branch
-                else:
-                    error_message = f"Failed to get repository info: {response.status}"
-                    logging.error(error_message)
-                    raise Exception(error_message)
+        if self.default_branch:
+            return self.default_branch
+
+        with STAGE_SECONDS.time(stage='branch_lookup'):
+            response = await cached_get(self.api_url)
+        if response.status == 200:
+            repo_info = response.json()
+            self.default_branch = repo_info.get('default_branch', 'master')
+            logging.info(f"Default branch for {self.username}/{self.repo_name} is {self.default_branch}")
+            return self.default_branch
+        else:
+            error_message = f"Failed to get repository info: {response.status}"
+            logging.error(error_message)
+            raise Exception(error_message)
+
+    async def get_head_sha(self):
+        if self.commit_sha:
+            return self.commit_sha
 
-    async def download_and_extract_repo(self):
         default_branch = await self.get_default_branch()
-        repo_url = self.repo_url_template.format(
-            username=self.username,
-            repo_name=self.repo_name,
-            branch=default_branch
-        )
+        api_url = f"{self.api_url}/commits/{default_branch}"
+        with STAGE_SECONDS.time(stage='branch_lookup'):
+            response = await cached_get(api_url, accept='application/vnd.github.sha')
+        if response.status == 200:
+            self.commit_sha = response.text().strip()
+            logging.info(f"Head of {self.username}/{self.repo_name}@{default_branch} is {self.commit_sha}")
+            return self.commit_sha
+        else:
+            error_message = f"Failed to get head commit: {response.status}"
+            logging.error(error_message)
+            raise Exception(error_message)
 
-        headers = {}
-        token = os.getenv('GITHUB_TOKEN')
-        if token:
-            headers['Authorization'] = f'token {token}'
+    async def download_repo(self):
+        default_branch = await self.get_default_branch()
+        if self.commit_sha:
+            repo_url = self.commit_url_template.format(
+                username=self.username,
+                repo_name=self.repo_name,
+                commit_sha=self.commit_sha
+            )
+        else:
+            repo_url = self.repo_url_template.format(
+                username=self.username,
+                repo_name=self.repo_name,
+                branch=default_branch
+            )
 
         logging.info(f"Downloading repository {self.username}/{self.repo_name} from {repo_url}")
-        async with aiohttp.ClientSession() as session:
-            async with session.get(repo_url, headers=headers) as response:
+        with STAGE_SECONDS.time(stage='download'):
+            async with github_request(repo_url) as response:
                 if response.status == 200:
-                    content = await response.read()
-                    with zipfile.ZipFile(io.BytesIO(content)) as zip_ref:
-                        zip_ref.extractall(self.clone_base_dir)
-                    extracted_folder_name = f"{self.repo_name}-{default_branch}"
-                    self.clone_dir = os.path.join(self.clone_base_dir, extracted_folder_name)
-                    logging.info(f"Extracted repository to {self.clone_dir}")
+                    return await self.spool_response(response), default_branch
                 else:
                     error_message = f"Failed to download repository: {response.status}"
                     logging.error(error_message)
                     raise Exception(error_message)
 
-    @staticmethod
-    async def process_file(file_path):
-        lines_of_code = 0
-        comment_lines = 0
-        blank_lines = 0
+    async def spool_response(self, response):
+        limit = self.max_archive_bytes
+        if limit and response.content_length and response.content_length > limit:
+            raise Exception(f"Repository {self.repo_name} archive exceeds {limit} bytes")
 
+        archive = tempfile.SpooledTemporaryFile(max_size=self.spool_threshold)
+        received = 0
         try:
-            async with aiofiles.open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                async for line in f:
-                    stripped_line = line.strip()
-                    if not stripped_line:
-                        blank_lines += 1
-                    elif stripped_line.startswith(('#', '//', '/*', '*', '*/')):
-                        comment_lines += 1
-                    else:
-                        lines_of_code += 1
-            logging.info(f"Processed file {file_path}")
-        except Exception as e:
-            logging.error(f"Error processing file {file_path}: {e}")
-
-        return lines_of_code, comment_lines, blank_lines
+            async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                received += len(chunk)
+                if limit and received > limit:
+                    raise Exception(f"Repository {self.repo_name} archive exceeds {limit} bytes")
+                archive.write(chunk)
+        except BaseException:
+            archive.close()
+            raise
+        archive.seek(0)
+        DOWNLOAD_BYTES.inc(received, kind='archive')
+        logging.info(f"Downloaded {received} bytes for {self.username}/{self.repo_name}")
+        return archive
 
-    async def count_lines_of_code(self):
-        lines_of_code = 0
-        comment_lines = 0
-        blank_lines = 0
-        lines_of_code_per_language = {}
+    async def download_and_extract_repo(self):
+        archive, _ = await self.download_repo()
+        self.clone_base_dir = tempfile.mkdtemp()
+        with archive:
+            # Extraction is blocking; keep it off the shared event loop
+            await asyncio.to_thread(self.extract_archive, archive)
+        # GitHub archives hold a single "<repo>-<ref>" folder
+        extracted = os.listdir(self.clone_base_dir)
+        if len(extracted) == 1:
+            self.clone_dir = os.path.join(self.clone_base_dir, extracted[0])
+        else:
+            self.clone_dir = self.clone_base_dir
+        logging.info(f"Extracted repository to {self.clone_dir}")
+
+    def extract_archive(self, archive):
+        with STAGE_SECONDS.time(stage='extraction'), zipfile.ZipFile(archive) as zip_ref:
+            zip_ref.extractall(self.clone_base_dir)
+
+    def iter_archive_members(self, zip_ref):
+        seen_dirs = set()
+        for member in zip_ref.infolist():
+            # Member paths are prefixed with the "<repo>-<branch>/" folder
+            parts = member.filename.rstrip('/').split('/')[1:]
+            if not parts:
+                continue
+            dir_parts = parts if member.is_dir() else parts[:-1]
+            if self.ignore_rules.ignores_dir('/'.join(dir_parts)):
+                continue
+
+            for depth in range(1, len(dir_parts) + 1):
+                dir_path = tuple(dir_parts[:depth])
+                if dir_path not in seen_dirs:
+                    seen_dirs.add(dir_path)
+                    self.directories.add('/'.join(dir_path))
+
+            if member.is_dir():
+                continue
+            path = '/'.join(parts)
+            if self.ignore_rules.ignores_file(path):
+                continue
+
+            # The declared size and the first bytes decide; oversized and
+            # binary members are never decompressed in full
+            if member.file_size > settings.MAX_FILE_BYTES:
+                self.skip(path, TOO_LARGE)
+                continue
+            try:
+                with zip_ref.open(member) as f:
+                    head = f.read(SNIFF_BYTES)
+                    reason = sniff(head, member.file_size)
+                    if reason:
+                        self.skip(path, reason)
+                        continue
+                    data = head + f.read()
+            except Exception as e:
+                logging.error(f"Error processing member {member.filename}: {e}")
+                continue
+            yield path, PurePosixPath(path).suffix, data
+
+    def count(self, task, files, size_of):
+        """Count `files` with `task` in the process pool.
+
+        Time spent producing the files (walking the tree or reading zip
+        members) is recorded as the file_walk stage and the rest, mostly
+        waiting on the pool, as classification.
+        """
+        walk_seconds = 0.0
 
-        files_to_process = []
+        def walk():
+            nonlocal walk_seconds
+            files_iter = iter(files)
+            while True:
+                started = time.perf_counter()
+                file = next(files_iter, None)
+                walk_seconds += time.perf_counter() - started
+                if file is None:
+                    return
+                yield file
+
+        started = time.perf_counter()
+        batches = iter_batches(walk(), size_of=size_of)
+        result = self.aggregate(run_batches(partial(task, max_file_bytes=settings.MAX_FILE_BYTES), batches))
+        STAGE_SECONDS.observe(walk_seconds, stage='file_walk')
+        STAGE_SECONDS.observe(time.perf_counter() - started - walk_seconds, stage='classification')
+        return result
+
+    def count_lines_in_archive(self, archive):
+        with zipfile.ZipFile(archive) as zip_ref:
+            return self.count(count_blobs, self.iter_archive_members(zip_ref), size_of=lambda member: len(member[2]))
+
+    def iter_directory_files(self):
         for root, dirs, files in os.walk(self.clone_dir):
-            dirs[:] = [d for d in dirs if d not in self.ignore_dirs]
+            relative_root = Path(root).relative_to(self.clone_dir).as_posix()
+            prefix = '' if relative_root == '.' else relative_root + '/'
+            dirs[:] = [d for d in dirs if not self.ignore_rules.ignores_dir(prefix + d)]
             for file in files:
-                ext = Path(file).suffix
-                if ext not in self.ignore_extensions:
-                    file_path = os.path.join(root, file)
-                    files_to_process.append((file_path, ext))
-            # Update directory counter
-            self.directory_counter.update(dirs)
-
-        if not files_to_process:
-            logging.info("No files to process in the repository.")
-            return lines_of_code, comment_lines, blank_lines, lines_of_code_per_language
+                if not self.ignore_rules.ignores_file(prefix + file):
+                    yield os.path.join(root, file), Path(file).suffix
+            self.directories.update(prefix + d for d in dirs)
 
-        async def process_and_collect(file_path, ext):
-            loc, comments, blanks = await self.process_file(file_path)
-            return loc, comments, blanks, ext
+    def count_lines_in_directory(self):
+        return self.count(count_files, self.iter_directory_files(), size_of=lambda file: os.path.getsize(file[0]))
 
-        logging.info(f"Starting to process {len(files_to_process)} files")
-        tasks = [process_and_collect(file_path, ext) for file_path, ext in files_to_process]
-        results = await asyncio.gather(*tasks)
+    async def count_lines_of_code(self):
+        # Walking and counting block, so they run in a worker thread that
+        # feeds the process pool
+        return await asyncio.to_thread(self.count_lines_in_directory)
+
+    def skip(self, path, reason):
+        self.skipped[reason] += 1
+        SKIPPED_FILES.inc(reason=reason)
+        self.files[path] = ('', '', 0, 0, 0, reason)
 
-        for loc, comments, blanks, ext in results:
+    def aggregate(self, results):
+        lines_of_code = 0
+        comment_lines = 0
+        blank_lines = 0
+        lines_of_code_per_language = {}
+        processed_files = 0
+
+        for path, blob_sha, language, loc, comments, blanks, skip_reason in results:
+            if self.clone_dir:
+                path = Path(path).relative_to(self.clone_dir).as_posix()
+            if skip_reason:
+                self.skip(path, skip_reason)
+                continue
+            self.files[path] = (blob_sha, language, loc, comments, blanks, '')
+            processed_files += 1
+            if processed_files % settings.FILE_LOG_SAMPLE == 0:
+                logging.debug(f"Counted {self.username}/{self.repo_name}/{path}: {loc} LOC, {comments} comments, {blanks} blanks")
             lines_of_code += loc
             comment_lines += comments
             blank_lines += blanks
-            if ext:
-                if ext in lines_of_code_per_language:
-                    lines_of_code_per_language[ext] += loc
-                else:
-                    lines_of_code_per_language[ext] = loc
+            if language:
+                lines_of_code_per_language[language] = lines_of_code_per_language.get(language, 0) + loc
 
-        logging.info(f"Finished processing files. Total LOC: {lines_of_code}, Comments: {comment_lines}, Blanks: {blank_lines}")
+        FILES.inc(processed_files)
+        LINES.inc(lines_of_code, kind='code')
+        LINES.inc(comment_lines, kind='comment')
+        LINES.inc(blank_lines, kind='blank')
+        if not processed_files:
+            logging.info("No files to process in the repository.")
+        logging.info(f"Finished processing {processed_files} files. Total LOC: {lines_of_code}, Comments: {comment_lines}, Blanks: {blank_lines}")
+        if self.skipped:
+            logging.info(f"Skipped {sum(self.skipped.values())} files of {self.username}/{self.repo_name}: {dict(self.skipped)}")
         return lines_of_code, comment_lines, blank_lines, lines_of_code_per_language
 
-    async def log_common_directories(self):
-        try:
-            log_dir = os.path.join(os.getcwd(), 'logs')
-            os.makedirs(log_dir, exist_ok=True)
-            log_file_path = os.path.join(log_dir, 'common_directories.log')
-            async with aiofiles.open(log_file_path, 'a') as log_file:
-                await log_file.write(f"Repository: {self.repo_name}\n")
-                for directory, count in self.directory_counter.most_common():
-                    await log_file.write(f"{directory}: {count}\n")
-                await log_file.write("\n")
-            logging.info(f"Logged common directories to {log_file_path}")
-        except Exception as e:
-            logging.error(f"Failed to log common directories: {e}")
+    async def record_directories(self):
+        # Batched in memory; only written to DirectoryStat when a flush is due
+        DirectoryStats.record(Counter(PurePosixPath(path).name for path in self.directories))
+        if DirectoryStats.flush_due():
+            await sync_to_async(DirectoryStats.flush)()
+
+    async def analyze_async(self):
+        if self.in_memory:
+            archive, _ = await self.download_repo()
+            with archive:
+                loc, comments, blanks, loc_by_lang = await asyncio.to_thread(self.count_lines_in_archive, archive)
+            await self.record_directories()
+            return {
+                'loc': loc,
+                'comments': comments,
+                'blanks': blanks,
+                'locByLangs': loc_by_lang,
+                'skipped': dict(self.skipped)
+            }
 
-    def analyze(self):
         try:
-            self.download_and_extract_repo()
-            loc, comments, blanks, loc_by_lang = self.count_lines_of_code()
-            self.log_common_directories()
+            await self.download_and_extract_repo()
+            loc, comments, blanks, loc_by_lang = await self.count_lines_of_code()
+            await self.record_directories()
         finally:
-            shutil.rmtree(self.clone_base_dir, ignore_errors=True)
-            logging.info(f"Cleaned up temporary directory {self.clone_base_dir}")
+            if self.clone_base_dir:
+                await asyncio.to_thread(shutil.rmtree, self.clone_base_dir, ignore_errors=True)
+                logging.info(f"Cleaned up temporary directory {self.clone_base_dir}")
         return {
             'loc': loc,
             'comments': comments,
             'blanks': blanks,
-            'locByLangs': loc_by_lang
-        }
\ No newline at end of file
+            'locByLangs': loc_by_lang,
+            'skipped': dict(self.skipped)
+        }
+
+    async def get_comparison(self, base_sha):
+        api_url = f"{self.api_url}/compare/{base_sha}...{self.commit_sha}"
+        async with github_request(api_url) as response:
+            if response.status == 200:
+                return await response.json()
+            else:
+                error_message = f"Failed to compare {base_sha[:7]}...{self.commit_sha[:7]}: {response.status}"
+                logging.error(error_message)
+                raise Exception(error_message)
+
+    async def download_blob(self, blob_sha):
+        api_url = f"{self.api_url}/git/blobs/{blob_sha}"
+        async with github_request(api_url, accept='application/vnd.github.raw') as response:
+            if response.status == 200:
+                data = await response.read()
+                DOWNLOAD_BYTES.inc(len(data), kind='blob')
+                return data
+            else:
+                error_message = f"Failed to download blob {blob_sha}: {response.status}"
+                logging.error(error_message)
+                raise Exception(error_message)
+
+    async def analyze_incremental(self, base_sha, base_result, load_files, base_directories=()):
+        """Bring the result of `base_sha` up to the head commit by counting
+        only the files changed in between.
+
+        `load_files(paths)` returns the stored per-file counts of those paths
+        at `base_sha`. Returns (result, changed, removed): the new totals, the
+        per-file counts to store, and the stored paths that no longer exist.
+        Raises when GitHub cannot give a complete list of changes, in which
+        case the caller falls back to a full analysis.
+
+        `self.directories` becomes `base_directories` plus the directories of
+        added files, and is recorded like a full analysis. Directories that
+        removals emptied stay in it until the next full analysis.
+        """
+        comparison = await self.get_comparison(base_sha)
+        if comparison.get('status') not in ('ahead', 'identical'):
+            raise Exception(f"Head is {comparison.get('status')} of {base_sha[:7]}, not ahead")
+        changes = comparison.get('files', [])
+        if len(changes) >= settings.INCREMENTAL_MAX_FILES:
+            raise Exception(f"{len(changes)} changed files, the compare API may have left some out")
+
+        replaced = set()
+        fetch = {}
+        renames = {}
+        # Only becomes self.directories on success, so a fallback to a full
+        # analysis starts from nothing
+        directories = set(base_directories)
+        for change in changes:
+            path = change['filename']
+            replaced.add(path)
+            if change['status'] == 'renamed':
+                replaced.add(change['previous_filename'])
+                renames[path] = change['previous_filename']
+            if change['status'] == 'removed':
+                continue
+            dir_parts = path.split('/')[:-1]
+            if not self.ignore_rules.ignores_dir('/'.join(dir_parts)):
+                # Like the archive walk, also for files ignored by extension
+                directories.update('/'.join(dir_parts[:depth]) for depth in range(1, len(dir_parts) + 1))
+            if not self.ignore_rules.ignores_file(path):
+                fetch[path] = change['sha']
+
+        base_files = await load_files(replaced)
+        changed = {}
+        # A rename without edits keeps its counts; nothing to download
+        for path, previous_path in renames.items():
+            previous = base_files.get(previous_path)
+            if path in fetch and previous and not previous[5] and previous[0] == fetch[path] and \
+                    PurePosixPath(path).suffix == PurePosixPath(previous_path).suffix:
+                changed[path] = previous
+                del fetch[path]
+
+        semaphore = asyncio.Semaphore(BLOB_DOWNLOAD_CONCURRENCY)
+
+        async def download(path, blob_sha):
+            async with semaphore:
+                return path, PurePosixPath(path).suffix, await self.download_blob(blob_sha)
+
+        with STAGE_SECONDS.time(stage='blob_download'):
+            blobs = await asyncio.gather(*(download(path, blob_sha) for path, blob_sha in fetch.items()))
+        with STAGE_SECONDS.time(stage='classification'):
+            counted = await asyncio.to_thread(
+                lambda: list(run_batches(
+                    partial(count_blobs, max_file_bytes=settings.MAX_FILE_BYTES),
+                    iter_batches(blobs, size_of=lambda blob: len(blob[2])),
+                ))
+            )
+        for path, blob_sha, language, loc, comments, blanks, skip_reason in counted:
+            changed[path] = (blob_sha, language, loc, comments, blanks, skip_reason)
+            if skip_reason:
+                SKIPPED_FILES.inc(reason=skip_reason)
+            else:
+                FILES.inc()
+                LINES.inc(loc, kind='code')
+                LINES.inc(comments, kind='comment')
+                LINES.inc(blanks, kind='blank')
+        logging.info(f"Counted {len(counted)} changed files of {self.username}/{self.repo_name} since {base_sha[:7]}")
+
+        result = {
+            'loc': base_result['loc'],
+            'comments': base_result['comments'],
+            'blanks': base_result['blanks'],
+            'locByLangs': dict(base_result['locByLangs']),
+            'skipped': dict(base_result.get('skipped', {})),
+        }
+        for sign, entries in ((-1, base_files.values()), (1, changed.values())):
+            for _, language, loc, comments, blanks, skip_reason in entries:
+                if skip_reason:
+                    result['skipped'][skip_reason] = result['skipped'].get(skip_reason, 0) + sign
+                    continue
+                result['loc'] += sign * loc
+                result['comments'] += sign * comments
+                result['blanks'] += sign * blanks
+                # Like aggregate(): files without a language only count in the totals
+                if language:
+                    result['locByLangs'][language] = result['locByLangs'].get(language, 0) + sign * loc
+        result['locByLangs'] = {language: loc for language, loc in result['locByLangs'].items() if loc}
+        result['skipped'] = {reason: count for reason, count in result['skipped'].items() if count}
+        removed = set(base_files) - set(changed)
+        self.directories = directories
+        await self.record_directories()
+        return result, changed, removed
+
+    def analyze(self):
+        return run_on_event_loop(self.analyze_async())
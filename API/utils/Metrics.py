@@ -0,0 +1,257 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Prometheus-style metrics, kept in memory per process. The analysis runs in
+# the worker processes while /API/metrics is served by the web processes, so
+# the long-running processes (those that call publish()) also write a
+# snapshot of their values to METRICS_DIR (at most once per
+# METRICS_FLUSH_INTERVAL) and the endpoint adds up the snapshots of all
+# processes on the host.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry = {}
+_lock = threading.Lock()
+_last_flush = 0.0
+_publishing = False
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}  # label values -> value
+        _registry[name] = self
+
+    def key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labelnames)
+
+    def snapshot(self):
+        return [[list(key), value[:] if isinstance(value, list) else value] for key, value in self.values.items()]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        maybe_flush()
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        maybe_flush()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with _lock:
+            self.values[key] = value
+        maybe_flush()
+
+    @contextmanager
+    def track_in_progress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with _lock:
+            # [count per bucket..., count, sum]; buckets are not cumulative here
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            entry[-2] += 1
+            entry[-1] += value
+        maybe_flush()
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+# Analysis pipeline
+STAGE_SECONDS = Histogram(
+    'analysis_stage_seconds',
+    'Time spent per analysis stage (listing, branch_lookup, download, blob_download, extraction, '
+    'file_walk, classification, db_save)',
+    ['stage'],
+)
+DOWNLOAD_BYTES = Counter('analysis_download_bytes_total', 'Bytes of archives and blobs downloaded from GitHub', ['kind'])
+ANALYSES_IN_PROGRESS = Gauge('analyses_in_progress', 'Repository analyses currently running')
+JOBS_IN_PROGRESS = Gauge('analysis_jobs_in_progress', 'Profile analysis jobs currently running')
+REPOSITORIES = Counter('analysis_repositories_total', 'Repositories analyzed, by how their result was obtained', ['result'])
+FILES = Counter('analysis_files_total', 'Files counted')
+LINES = Counter('analysis_lines_total', 'Lines counted, by kind', ['kind'])
+SKIPPED_FILES = Counter('analysis_skipped_files_total', 'Files not counted, by reason', ['reason'])
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups, by cache and outcome', ['cache', 'result'])
+
+# GitHub
+GITHUB_REQUESTS = Counter('github_requests_total', 'Responses received from GitHub, by status', ['status'])
+GITHUB_RETRIES = Counter('github_retries_total', 'GitHub requests retried, by reason', ['reason'])
+
+
+def snapshot():
+    with _lock:
+        return {name: metric.snapshot() for name, metric in _registry.items()}
+
+
+def snapshot_path(pid):
+    return os.path.join(settings.METRICS_DIR, f"{pid}.json")
+
+
+def publish():
+    """Share this process's values through METRICS_DIR from now on.
+
+    Only for the web and worker processes: a one-off management command
+    would leave a snapshot behind on every run.
+    """
+    global _publishing
+    _publishing = True
+    flush()
+
+
+def flush():
+    """Write this process's values where the metrics endpoint can read them."""
+    global _last_flush
+    _last_flush = time.monotonic()
+    if not _publishing or not settings.METRICS_DIR:
+        return
+    try:
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = snapshot_path(os.getpid())
+        with open(path + '.tmp', 'w') as f:
+            json.dump(snapshot(), f)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        logging.error(f"Failed to write metrics snapshot: {e}")
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+atexit.register(flush)
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def read_snapshots():
+    """Yield (alive, snapshot) for every other process that wrote one.
+
+    Snapshots of processes that exited more than METRICS_DEAD_RETENTION
+    seconds ago are deleted instead.
+    """
+    if not settings.METRICS_DIR or not os.path.isdir(settings.METRICS_DIR):
+        return
+    now = time.time()
+    for file_name in os.listdir(settings.METRICS_DIR):
+        pid, ext = os.path.splitext(file_name)
+        if ext != '.json' or not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        path = os.path.join(settings.METRICS_DIR, file_name)
+        try:
+            alive = is_alive(int(pid))
+            if not alive and now - os.path.getmtime(path) > settings.METRICS_DEAD_RETENTION:
+                os.remove(path)
+                continue
+            with open(path) as f:
+                yield alive, json.load(f)
+        except (OSError, ValueError):
+            continue
+
+
+def merge(totals, metric, values):
+    for key, value in values:
+        key = tuple(key)
+        if metric.kind == 'histogram':
+            entry = totals.setdefault(key, [0] * len(value))
+            for i, amount in enumerate(value):
+                entry[i] += amount
+        else:
+            totals[key] = totals.get(key, 0) + value
+
+
+def format_labels(metric, key, extra=()):
+    pairs = list(zip(metric.labelnames, key)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def render():
+    """All metrics of every process on the host, in the Prometheus text format."""
+    merged = {name: {} for name in _registry}
+    sources = [(True, snapshot())] + list(read_snapshots())
+    for alive, values in sources:
+        for name, metric_values in values.items():
+            metric = _registry.get(name)
+            # A finished process's counters still count; its gauges do not
+            if metric is None or (metric.kind == 'gauge' and not alive):
+                continue
+            merge(merged[name], metric, metric_values)
+
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(merged[name].items()):
+            if metric.kind != 'histogram':
+                lines.append(f"{name}{format_labels(metric, key)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets, value):
+                cumulative += count
+                lines.append(f"{name}_bucket{format_labels(metric, key, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{name}_bucket{format_labels(metric, key, [('le', '+Inf')])} {value[-2]}")
+            lines.append(f"{name}_count{format_labels(metric, key)} {value[-2]}")
+            lines.append(f"{name}_sum{format_labels(metric, key)} {value[-1]}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,109 @@
+import threading
+import time
+
+from django.conf import settings
+
+# GitHub's rate limit headers
+LIMIT_HEADER = 'X-RateLimit-Limit'
+REMAINING_HEADER = 'X-RateLimit-Remaining'
+RESET_HEADER = 'X-RateLimit-Reset'
+
+
+class TokenState:
+    """What is known about one token's rate limit budget.
+
+    `remaining` and `reset` come from the headers of the last response made
+    with the token and are only trusted until `reset` passes.
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.limit = None
+        self.remaining = None  # Unknown until the first response
+        self.reset = 0.0
+        self.in_flight = 0
+        self.used = 0
+        # Set by secondary rate limits and Retry-After
+        self.blocked_until = 0.0
+        # Set when pacing the last requests of a nearly spent budget
+        self.next_at = 0.0
+
+    def budget(self, now):
+        if self.remaining is None or self.reset <= now:
+            return float('inf')
+        return self.remaining - self.in_flight
+
+    def wait_time(self, now):
+        """Seconds until the token may be used again; 0 if it may be used now."""
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.budget(now) <= 0:
+            return self.reset - now
+        return max(0.0, self.next_at - now)
+
+    def update(self, headers, now):
+        remaining = headers.get(REMAINING_HEADER)
+        reset = headers.get(RESET_HEADER)
+        if remaining is None or reset is None:
+            return
+        self.remaining = int(remaining)
+        self.reset = float(reset)
+        self.limit = int(headers.get(LIMIT_HEADER, 0)) or self.limit
+        # Rather than spending the rest of the budget at once and stalling
+        # until the reset, spread the last requests evenly over what is left
+        # of the window. The reserve is at most a tenth of the token's limit,
+        # so an anonymous 60/hour budget is not paced from its first request
+        reserve = settings.GITHUB_RATE_LIMIT_RESERVE
+        if self.limit:
+            reserve = min(reserve, self.limit // 10)
+        if self.remaining < reserve and self.reset > now:
+            self.next_at = now + (self.reset - now) / (self.remaining + 1)
+        else:
+            self.next_at = 0.0
+
+
+class TokenPool:
+    """Hands out the token with the most budget left, least used first.
+
+    Shared by every event loop of the process, hence the thread lock;
+    nothing in here blocks.
+    """
+
+    def __init__(self, tokens):
+        # Without tokens requests are anonymous, with the 60/hour budget
+        self.states = [TokenState(token) for token in tokens] or [TokenState(None)]
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Return (state, 0) for a token to use now, or (None, seconds) until one frees up."""
+        with self.lock:
+            now = time.time()
+            ready = [state for state in self.states if state.wait_time(now) == 0]
+            if not ready:
+                return None, min(state.wait_time(now) for state in self.states)
+            state = max(ready, key=lambda state: (state.budget(now), -state.in_flight, -state.used))
+            state.in_flight += 1
+            state.used += 1
+            return state, 0
+
+    def release(self, state, headers=None):
+        with self.lock:
+            state.in_flight -= 1
+            if headers is not None:
+                state.update(headers, time.time())
+
+    def block(self, state, seconds):
+        with self.lock:
+            state.blocked_until = max(state.blocked_until, time.time() + seconds)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_token_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TokenPool(settings.GITHUB_TOKENS)
+    return _pool
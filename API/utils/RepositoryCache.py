@@ -0,0 +1,122 @@
+import hashlib
+import json
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from Models.models import RepositoryRecord, RepositoryFile
+
+# Bump when counting semantics change so stale per-repository results are not reused
+RULES_VERSION = 7
+
+
+def rules_hash(ignore_dirs, ignore_extensions):
+    payload = json.dumps({
+        'version': RULES_VERSION,
+        'ignore_dirs': sorted(ignore_dirs),
+        'ignore_extensions': sorted(ignore_extensions),
+    })
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def record_result(record):
+    return {
+        'loc': record.lines_of_code,
+        'comments': record.comment_lines,
+        'blanks': record.blank_lines,
+        'locByLangs': record.lines_of_code_per_language,
+        'skipped': record.skipped_files,
+    }
+
+
+def get_cached_result(owner, name, commit_sha, rules):
+    record = RepositoryRecord.objects.filter(
+        owner=owner, name=name, commit_sha=commit_sha, rules_hash=rules
+    ).first()
+    if record is None:
+        return None
+    return {**record_result(record), 'cached': True}
+
+
+def get_previous_result(owner, name, rules):
+    """Return (record_id, commit_sha, result, directories) of the last
+    analysis of the repository with these rules, if it stored per-file
+    counts and directories."""
+    record = RepositoryRecord.objects.filter(owner=owner, name=name, rules_hash=rules).order_by('-date_analyzed').first()
+    if record is None or record.directories is None or not record.files.exists():
+        return None
+    return record.id, record.commit_sha, record_result(record), record.directories
+
+
+def get_file_entries(record_id, paths):
+    entries = RepositoryFile.objects.filter(repository_id=record_id, path__in=list(paths)).values_list(
+        'path', 'blob_sha', 'language', 'lines_of_code', 'comment_lines', 'blank_lines', 'skip_reason'
+    )
+    return {path: tuple(entry) for path, *entry in entries}
+
+
+def record_fields(result):
+    return {
+        'lines_of_code': result['loc'],
+        'comment_lines': result['comments'],
+        'blank_lines': result['blanks'],
+        'lines_of_code_per_language': result['locByLangs'],
+        'skipped_files': result.get('skipped', {}),
+    }
+
+
+@contextmanager
+def write_transaction(model):
+    """transaction.atomic() that takes SQLite's write lock before reading.
+
+    A deferred SQLite transaction that reads and then writes fails at once
+    with "database is locked", instead of waiting, when another connection
+    (another worker thread) writes in between.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'sqlite':
+            model.objects.filter(id=0).update(id=F('id'))
+        yield
+
+
+def file_rows(record, files):
+    return [
+        RepositoryFile(
+            repository=record, path=path, blob_sha=blob_sha, language=language,
+            lines_of_code=loc, comment_lines=comments, blank_lines=blanks, skip_reason=skip_reason,
+        )
+        for path, (blob_sha, language, loc, comments, blanks, skip_reason) in files.items()
+    ]
+
+
+def store_result(owner, name, commit_sha, rules, result, files, directories):
+    with write_transaction(RepositoryRecord):
+        # Only the latest commit per repository and rule set is worth keeping
+        RepositoryRecord.objects.filter(owner=owner, name=name, rules_hash=rules).exclude(commit_sha=commit_sha).delete()
+        record, _ = RepositoryRecord.objects.update_or_create(
+            owner=owner,
+            name=name,
+            commit_sha=commit_sha,
+            rules_hash=rules,
+            defaults={**record_fields(result), 'directories': sorted(directories)},
+        )
+        record.files.all().delete()
+        RepositoryFile.objects.bulk_create(file_rows(record, files), batch_size=1000)
+
+
+def store_incremental(record_id, commit_sha, result, changed, removed, directories):
+    """Move a stored analysis forward to `commit_sha`, rewriting only the
+    rows of files that changed."""
+    with write_transaction(RepositoryRecord):
+        record = RepositoryRecord.objects.select_for_update().get(id=record_id)
+        RepositoryRecord.objects.filter(
+            owner=record.owner, name=record.name, rules_hash=record.rules_hash, commit_sha=commit_sha
+        ).exclude(id=record.id).delete()
+        record.commit_sha = commit_sha
+        record.directories = sorted(directories)
+        for field, value in record_fields(result).items():
+            setattr(record, field, value)
+        record.save()
+        record.files.filter(path__in=list(removed) + list(changed)).delete()
+        RepositoryFile.objects.bulk_create(file_rows(record, changed), batch_size=1000)
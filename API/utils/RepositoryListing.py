@@ -0,0 +1,64 @@
+import asyncio
+import logging
+
+from django.conf import settings
+
+from API.utils.Metrics import STAGE_SECONDS
+from API.utils.ResponseCache import cached_get
+
+PER_PAGE = 100
+
+
+async def fetch_page(username, page):
+    url = f"{settings.GITHUB_API_BASE}/users/{username}/repos"
+    params = {'per_page': PER_PAGE, 'page': page}
+    with STAGE_SECONDS.time(stage='listing'):
+        response = await cached_get(url, params=params)
+    if response.status != 200:
+        error_message = f"Failed to list repositories for {username}: {response.status}"
+        logging.error(error_message)
+        raise Exception(error_message)
+    return response.json(), response.links
+
+
+def last_page(links):
+    last = links.get('last')
+    if not last:
+        return 1
+    return int(last['url'].query.get('page', 1))
+
+
+async def iter_repositories(username):
+    """Yield every repository of `username` as soon as its page arrives.
+
+    Page 1 tells us (via the Link header) how many pages there are; the rest
+    are then fetched concurrently and yielded in arrival order.
+    """
+    repositories, links = await fetch_page(username, 1)
+    for repository in repositories:
+        yield repository
+
+    pages = last_page(links)
+    if pages <= 1:
+        return
+
+    logging.info(f"Fetching {pages - 1} more repository pages for {username}")
+    tasks = [asyncio.ensure_future(fetch_page(username, page)) for page in range(2, pages + 1)]
+    try:
+        for future in asyncio.as_completed(tasks):
+            repositories, _ = await future
+            for repository in repositories:
+                yield repository
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def skip_reason(repository, max_repository_size):
+    if repository['size'] > max_repository_size:
+        return 'is too large'
+    if repository['size'] == 0:
+        return 'is empty'
+    if repository['fork']:
+        return 'is a fork'
+    return None
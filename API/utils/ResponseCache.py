@@ -0,0 +1,121 @@
+import hashlib
+import json
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+from yarl import URL
+
+from API.utils.HttpClient import github_request
+from API.utils.Metrics import CACHE_REQUESTS
+from API.utils.RepositoryCache import write_transaction
+from Models.models import CachedResponse
+
+# Response headers callers read back from a cached copy
+KEPT_HEADERS = ('Content-Type', 'Link')
+LINK_PATTERN = re.compile(r'<([^>]*)>\s*;\s*rel="?([^",]+)"?')
+
+
+class GitHubResponse:
+    """A fully read GitHub response, whether it came from GitHub or the cache."""
+
+    def __init__(self, status, body, headers, cached=False):
+        self.status = status
+        self.body = body
+        self.headers = headers
+        self.cached = cached
+
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.body)
+
+    @property
+    def links(self):
+        # Same shape as aiohttp's ClientResponse.links
+        return {rel: {'url': URL(url)} for url, rel in LINK_PATTERN.findall(self.headers.get('Link', ''))}
+
+
+def cache_key(url, accept, params):
+    # Not keyed on the token: GitHub compares the ETag against what it would
+    # return to the current token, so a stale match just costs a 200
+    payload = json.dumps([url, accept, sorted((params or {}).items())])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def load(key):
+    return CachedResponse.objects.filter(key=key).first()
+
+
+def touch(entry_id):
+    CachedResponse.objects.filter(id=entry_id).update(last_used=timezone.now())
+
+
+def store(key, url, headers, body):
+    with write_transaction(CachedResponse):
+        CachedResponse.objects.update_or_create(
+            key=key,
+            defaults={
+                'url': url,
+                'etag': headers.get('ETag', ''),
+                'last_modified': headers.get('Last-Modified', ''),
+                'headers': {name: headers[name] for name in KEPT_HEADERS if name in headers},
+                'body': body,
+                'size': len(body),
+                'last_used': timezone.now(),
+            },
+        )
+    evict()
+
+
+def evict():
+    """Drop the least recently used responses until the rest fit in HTTP_CACHE_MAX_BYTES."""
+    total = CachedResponse.objects.aggregate(total=Sum('size'))['total'] or 0
+    if total <= settings.HTTP_CACHE_MAX_BYTES:
+        return
+    stale = []
+    for entry_id, size in CachedResponse.objects.order_by('last_used').values_list('id', 'size').iterator():
+        if total <= settings.HTTP_CACHE_MAX_BYTES:
+            break
+        stale.append(entry_id)
+        total -= size
+    CachedResponse.objects.filter(id__in=stale).delete()
+
+
+async def cached_get(url, accept=None, params=None):
+    """GET `url` through github_request, revalidating a stored copy.
+
+    A stored response is sent back to GitHub as If-None-Match /
+    If-Modified-Since; a 304, which does not count against the rate limit,
+    is answered from the cache. Returns a GitHubResponse; only 200s that
+    carry a validator are stored.
+    """
+    if not settings.HTTP_CACHE:
+        async with github_request(url, accept=accept, params=params) as response:
+            return GitHubResponse(response.status, await response.read(), response.headers)
+
+    key = cache_key(url, accept, params)
+    entry = await sync_to_async(load)(key)
+    conditional = {}
+    if entry is not None:
+        if entry.etag:
+            conditional['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            conditional['If-Modified-Since'] = entry.last_modified
+
+    async with github_request(url, accept=accept, params=params, headers=conditional) as response:
+        if response.status == 304 and entry is not None:
+            CACHE_REQUESTS.inc(cache='http', result='hit')
+            await sync_to_async(touch)(entry.id)
+            return GitHubResponse(200, bytes(entry.body), entry.headers, cached=True)
+        body = await response.read()
+        headers = response.headers
+    CACHE_REQUESTS.inc(cache='http', result='miss')
+
+    if response.status == 200 and ('ETag' in headers or 'Last-Modified' in headers) \
+            and len(body) <= settings.HTTP_CACHE_MAX_BYTES:
+        await sync_to_async(store)(key, url, headers, body)
+    return GitHubResponse(response.status, body, headers)
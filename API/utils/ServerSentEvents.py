@@ -0,0 +1,105 @@
+import asyncio
+import json
+import time
+from collections import Counter
+from contextlib import aclosing
+
+from django.conf import settings
+
+from API.utils.JobStream import follow
+
+# Sent when nothing else was for SSE_KEEPALIVE_INTERVAL seconds, so proxies
+# and load balancers do not close a quiet stream; EventSource ignores it
+KEEPALIVE = ": keepalive\n\n"
+
+
+def format_event(data, event_id=None):
+    """One SSE `message` event. EventSource remembers the last `id` and sends
+    it back as Last-Event-ID when it reconnects."""
+    id_line = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{id_line}event: message\ndata: {json.dumps(data)}\n\n"
+
+
+def event_id(job_id, seq):
+    return f"{job_id}:{seq}"
+
+
+def parse_event_id(value):
+    """(job id, seq) of an id made by event_id, or None."""
+    job_id, _, seq = (value or '').partition(':')
+    if not job_id.isdigit() or not seq.isdigit():
+        return None
+    return int(job_id), int(seq)
+
+
+def coalesce(progress):
+    """Merge consecutive progress events into the latest one, listing every
+    repository they covered and adding up their skipped files."""
+    if len(progress) == 1:
+        return progress[0]
+    skipped = Counter()
+    for data in progress:
+        skipped.update(data.get('skippedFiles', {}))
+    return {**progress[-1], 'repos': [data['repo'] for data in progress], 'skippedFiles': dict(skipped)}
+
+
+async def job_events(job, after=0):
+    """Stream the events of `job` after event `after` as SSE text.
+
+    Progress events arriving within SSE_COALESCE_WINDOW seconds of each other
+    go out as one; any other event first flushes the progress held back, so
+    the order is kept. A coalesced event carries the id of the last event it
+    covers, so resuming from it skips exactly what the client has seen.
+    """
+    async with aclosing(follow(job, after)) as events:
+        pending = None
+        progress = []
+        last_seq = after
+        flush_at = None
+        last_sent = time.monotonic()
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(anext(events))
+                now = time.monotonic()
+                timeout = last_sent + settings.SSE_KEEPALIVE_INTERVAL - now
+                if flush_at is not None:
+                    timeout = min(timeout, flush_at - now)
+                done, _ = await asyncio.wait({pending}, timeout=max(0, timeout))
+
+                if not done:
+                    if flush_at is not None and time.monotonic() >= flush_at:
+                        yield format_event(coalesce(progress), event_id(job.id, last_seq))
+                        progress, flush_at = [], None
+                    else:
+                        yield KEEPALIVE
+                    last_sent = time.monotonic()
+                    continue
+
+                try:
+                    seq, data = pending.result()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    pending = None
+
+                if data.get('type') == 'progress':
+                    progress.append(data)
+                    last_seq = seq
+                    if flush_at is None:
+                        flush_at = time.monotonic() + settings.SSE_COALESCE_WINDOW
+                    continue
+                if progress:
+                    yield format_event(coalesce(progress), event_id(job.id, last_seq))
+                    progress, flush_at = [], None
+                last_seq = seq
+                yield format_event(data, event_id(job.id, seq))
+                last_sent = time.monotonic()
+
+            if progress:
+                yield format_event(coalesce(progress), event_id(job.id, last_seq))
+        finally:
+            # The generator cannot be closed while the task is still inside it
+            if pending is not None:
+                pending.cancel()
+                await asyncio.wait({pending})
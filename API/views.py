@@ -1,26 +1,13 @@
-from django.shortcuts import render
-from django.http import JsonResponse, StreamingHttpResponse
-from Models.models import UserRecord
-from API.utils.LinesOfCode import RepoAnalyzer
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from Models.models import UserRecord, AnalysisJob
+from API.utils.JobQueue import enqueue, get_active_job
+from API.utils.ServerSentEvents import format_event, job_events, parse_event_id
+from API.utils import DirectoryStats, Leaderboard, Metrics
 from API.constants.ExtensionFilters import default_ignore_extensions, default_ignore_dirs
-import requests
-import json
-import time
 import asyncio
-import aiohttp
-import os
-from concurrent.futures import ThreadPoolExecutor
-from asgiref.sync import async_to_sync
-GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
-GITHUB_API_URL = 'https://api.github.com/users/{username}/repos?per_page=100'
-MAX_REPOSITORY_SIZE = 150000  # kilobytes
-executor = ThreadPoolExecutor(max_workers=5)
-
-async def get_repo_info(username):
-    headers = {'Authorization': f'token {GITHUB_TOKEN}'}
-    async with aiohttp.ClientSession() as session:
-        async with session.get(GITHUB_API_URL.format(username=username), headers=headers) as response:
-            return await response.json()
+from contextlib import aclosing
+import logging
 
 def getExtensions(request):
     return JsonResponse({
@@ -28,88 +15,89 @@ def getExtensions(request):
         'ignore_dirs': list(default_ignore_dirs)
     }, status=200)
 
-def getLeaderboard(request):
+async def getLeaderboard(request):
     page = int(request.GET.get('page', 1))
-    users = UserRecord.objects.order_by('-lines_of_code')[(page - 1) * 10: page * 10]
-    count = UserRecord.objects.count()
+    cursor = request.GET.get('cursor')
+    try:
+        users_list, next_cursor = await Leaderboard.get_page(cursor=cursor, page=page)
+    except Exception as e:
+        return JsonResponse({'message': str(e)}, status=400)
+    count = await Leaderboard.get_count()
     
-    users_list = [
-        {
-            'username': user.username,
-            'lines_of_code': user.lines_of_code,
-            'lines_of_code_per_language': user.lines_of_code_per_language
-        } for user in users
-    ]
-    
-    return JsonResponse({'users': users_list, 'count': count}, status=200)
+    return JsonResponse({'users': users_list, 'count': count, 'next_cursor': next_cursor}, status=200)
+
+async def getLanguageLeaderboard(request, language):
+    page = int(request.GET.get('page', 1))
+    cursor = request.GET.get('cursor')
+    try:
+        language, users_list, next_cursor, count = await Leaderboard.get_language_page(language, cursor=cursor, page=page)
+    except Exception as e:
+        return JsonResponse({'message': str(e)}, status=400)
+
+    return JsonResponse({'language': language, 'users': users_list, 'count': count, 'next_cursor': next_cursor}, status=200)
+
+async def getLanguageTotals(request):
+    return JsonResponse({'languages': await Leaderboard.get_language_totals()}, status=200)
 
 def refreshAccountData(request, username):
-    UserRecord.objects.filter(username__iexact=username).delete() 
-    return JsonResponse({'message': 'Data deleted'}, status=200)
+    # The current record stays visible until the new analysis replaces it
+    job = enqueue(username, default_ignore_dirs, default_ignore_extensions)
+    return JsonResponse({'message': 'Refresh queued', 'job': job.id}, status=200)
 
-def getLinesOfCode(request, username):
+async def getLinesOfCode(request, username):
     ignore_dirs = set(request.GET.get('ignore_dirs', '').split(',')) if request.GET.get('ignore_dirs') else default_ignore_dirs
     ignore_extensions = set(request.GET.get('ignore_extensions', '').split(',')) if request.GET.get('ignore_extensions') else default_ignore_extensions
 
-    print("IGNORE DIRS", ignore_dirs)
-    print("IGNORE EXTENSIONS", ignore_extensions)
+    logging.debug(f"Ignoring directories {ignore_dirs} and extensions {ignore_extensions} for {username}")
 
-    def stream_response():
+    # Sent back by EventSource when it reconnects; a stream that was cut off
+    # resumes after the last event the client got instead of starting over
+    resume = parse_event_id(request.headers.get('Last-Event-ID') or request.GET.get('last_event_id'))
+
+    async def stream_response():
             try:
-                user_record = UserRecord.objects.filter(username__iexact=username).first()
-                if user_record:
-                    yield f"event: message\ndata: {json.dumps({'type': 'result', 'total_lines_of_code': user_record.lines_of_code, 'lines_of_code_per_language': user_record.lines_of_code_per_language})}\n\n"
+                job = None
+                after = 0
+                if resume is not None:
+                    job = await AnalysisJob.objects.filter(id=resume[0], username__iexact=username).afirst()
+                    after = resume[1] if job is not None else 0
+                if job is None:
+                    job = await sync_to_async(get_active_job)(username)
+                if job is None:
+                    user_record = await UserRecord.objects.for_username(username).afirst()
+                    if user_record:
+                        yield format_event({'type': 'result', 'total_lines_of_code': user_record.lines_of_code, 'lines_of_code_per_language': user_record.lines_of_code_per_language})
+                        yield "event: message\ndata: Success\n\n"
+                        return
+                    job = await sync_to_async(enqueue)(username, ignore_dirs, ignore_extensions)
+
+                # The analysis runs in the worker; every viewer of the profile
+                # replays the same job's events from the start
+                async with aclosing(job_events(job, after)) as events:
+                    async for event in events:
+                        yield event
+
+                if job.status == AnalysisJob.SUCCEEDED:
                     yield "event: message\ndata: Success\n\n"
-                    return
-
-                repositories = async_to_sync(get_repo_info)(username)
-                total_repos = len(repositories)
-                processed_repos = 0
-                lines_of_code = 0
-                lines_of_code_per_language = {}
-
-                for repository in repositories:
-                    try:
-                        processed_repos += 1
-                        yield f"event: message\ndata: {{\"type\": \"progress\", \"repo\": \"{repository['name']}\", \"processedRepos\": {processed_repos}, \"totalRepos\": {total_repos}}}\n\n"
-
 
-                        if repository['size'] > MAX_REPOSITORY_SIZE:
-                            yield f"event: message\ndata: {{\"type\": \"error\", \"message\": \"Repository {repository['name']} is too large\"}}\n\n"
-                            continue
-                        elif repository['size'] == 0:
-                            yield f"event: message\ndata: {{\"type\": \"error\", \"message\": \"Repository {repository['name']} is empty\"}}\n\n"
-                            continue
-                        elif repository['fork']:
-                            yield f"event: message\ndata: {{\"type\": \"error\", \"message\": \"Repository {repository['name']} is a fork\"}}\n\n"
-                            continue
-
-                        analyzer = RepoAnalyzer(username, repository['name'], ignore_dirs, ignore_extensions)
-                        loc = analyzer.analyze()
-                        lines_of_code += loc.get('loc', 0)
-
-                        for lang, count in loc.get('locByLangs', {}).items():
-                            lines_of_code_per_language[lang] = lines_of_code_per_language.get(lang, 0) + count
-
-
-                    except Exception as e:
-                        yield f"event: message\ndata: {{\"type\": \"error\", \"message\": \"{str(e)}\"}}\n\n"
-                        continue
-
-                user_record = UserRecord(
-                    username=username,
-                    lines_of_code=lines_of_code,
-                    lines_of_code_per_language=lines_of_code_per_language,
-                    repositories=json.dumps(repositories)
-                )
-                user_record.save()
-
-                yield f"event: message\ndata: {json.dumps({'type': 'result', 'total_lines_of_code': user_record.lines_of_code, 'lines_of_code_per_language': lines_of_code_per_language})}\n\n"
-                yield "event: message\ndata: Success\n\n"
+            except asyncio.CancelledError:
+                # Client went away; the job keeps running in the worker
+                logging.info(f"Stopped streaming analysis of {username}: client disconnected")
+                raise
 
             except Exception as e:
-                yield f"event: message\ndata: {{\"type\": \"error\", \"message\": \"{str(e)}\"}}\n\n"
+                yield format_event({'type': 'error', 'message': str(e)})
 
     response = StreamingHttpResponse(stream_response(), content_type='text/event-stream')
     response['Cache-Control'] = 'no-cache'
-    return response
\ No newline at end of file
+    return response
+
+def getCommonDirectories(request):
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 100)), 1000))
+    except ValueError:
+        return JsonResponse({'message': 'limit must be a number'}, status=400)
+    return JsonResponse({'directories': DirectoryStats.get_common_directories(limit)}, status=200)
+
+def getMetrics(request):
+    return HttpResponse(Metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
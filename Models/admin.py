@@ -1,6 +1,13 @@
 from django.contrib import admin
-from Models.models import UserRecord 
+from Models.models import UserRecord, RepositoryRecord, AnalysisJob, AnalysisJobEvent, LanguageStat, RepositoryFile, CachedResponse, UserRepository, DirectoryStat
 
 
 admin.site.register(UserRecord)
-
+admin.site.register(UserRepository)
+admin.site.register(RepositoryRecord)
+admin.site.register(RepositoryFile)
+admin.site.register(AnalysisJob)
+admin.site.register(AnalysisJobEvent)
+admin.site.register(LanguageStat)
+admin.site.register(CachedResponse)
+admin.site.register(DirectoryStat)
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.15 on 2026-10-17 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Models", "0002_userrecord_lines_of_code_per_language"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RepositoryRecord",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("owner", models.CharField(max_length=100)),
+                ("name", models.CharField(max_length=100)),
+                ("commit_sha", models.CharField(max_length=40)),
+                ("rules_hash", models.CharField(max_length=64)),
+                ("lines_of_code", models.IntegerField()),
+                ("comment_lines", models.IntegerField()),
+                ("blank_lines", models.IntegerField()),
+                ("lines_of_code_per_language", models.JSONField()),
+                ("date_analyzed", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="repositoryrecord",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "name", "commit_sha", "rules_hash"),
+                name="unique_repository_analysis",
+            ),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.15 on 2026-10-17 02:40
+
+from django.db import migrations
+
+# The suffix -> language mapping of API/constants/Languages.py when this
+# migration was written, frozen so it gives the same result whatever the
+# registry looks like later
+EXTENSION_LANGUAGES = {
+    ".py": "Python", ".pyw": "Python", ".pyi": "Python",
+    ".js": "JavaScript", ".mjs": "JavaScript", ".cjs": "JavaScript", ".jsx": "JavaScript",
+    ".ts": "TypeScript", ".mts": "TypeScript", ".cts": "TypeScript", ".tsx": "TypeScript",
+    ".java": "Java",
+    ".c": "C", ".h": "C",
+    ".cpp": "C++", ".cc": "C++", ".cxx": "C++", ".hpp": "C++", ".hh": "C++", ".hxx": "C++",
+    ".cs": "C#",
+    ".go": "Go",
+    ".rs": "Rust",
+    ".kt": "Kotlin", ".kts": "Kotlin",
+    ".swift": "Swift",
+    ".scala": "Scala",
+    ".dart": "Dart",
+    ".m": "Objective-C", ".mm": "Objective-C",
+    ".php": "PHP",
+    ".css": "CSS",
+    ".scss": "SCSS",
+    ".less": "Less",
+    ".html": "HTML", ".htm": "HTML",
+    ".xml": "XML", ".xaml": "XML", ".csproj": "XML",
+    ".vue": "Vue",
+    ".svelte": "Svelte",
+    ".md": "Markdown", ".markdown": "Markdown",
+    ".sql": "SQL",
+    ".sh": "Shell", ".bash": "Shell", ".zsh": "Shell", ".fish": "Shell",
+    ".ps1": "PowerShell", ".psm1": "PowerShell",
+    ".rb": "Ruby",
+    ".pl": "Perl", ".pm": "Perl",
+    ".r": "R", ".R": "R",
+    ".ex": "Elixir", ".exs": "Elixir",
+    ".yml": "YAML", ".yaml": "YAML",
+    ".toml": "TOML",
+    ".lua": "Lua",
+    ".hs": "Haskell",
+    ".json": "JSON",
+    ".txt": "Text",
+}
+
+
+def suffixes_to_languages(apps, schema_editor):
+    # Totals used to be bucketed by raw file suffix; merge them into the
+    # language names the classifier reports now
+    UserRecord = apps.get_model("Models", "UserRecord")
+    for record in UserRecord.objects.all():
+        merged = {}
+        for key, count in (record.lines_of_code_per_language or {}).items():
+            language = EXTENSION_LANGUAGES.get(key, key)
+            merged[language] = merged.get(language, 0) + count
+        if merged != record.lines_of_code_per_language:
+            record.lines_of_code_per_language = merged
+            record.save(update_fields=["lines_of_code_per_language"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("Models", "0003_repositoryrecord"),
+    ]
+
+    operations = [
+        migrations.RunPython(suffixes_to_languages, migrations.RunPython.noop),
+    ]
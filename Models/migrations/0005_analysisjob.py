@@ -0,0 +1,105 @@
+# Generated by Django 4.2.15 on 2026-10-17 02:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Models", "0004_language_names_per_language"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AnalysisJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("username", models.CharField(max_length=100)),
+                ("rules_hash", models.CharField(max_length=64)),
+                ("ignore_dirs", models.JSONField()),
+                ("ignore_extensions", models.JSONField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("queued", "Queued"),
+                            ("running", "Running"),
+                            ("succeeded", "Succeeded"),
+                            ("failed", "Failed"),
+                        ],
+                        default="queued",
+                        max_length=10,
+                    ),
+                ),
+                ("processed_repos", models.IntegerField(default=0)),
+                ("total_repos", models.IntegerField(default=0)),
+                ("last_seq", models.IntegerField(default=0)),
+                ("attempts", models.IntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("worker", models.CharField(blank=True, max_length=100)),
+                ("heartbeat", models.DateTimeField(blank=True, null=True)),
+                ("date_created", models.DateTimeField(auto_now_add=True)),
+                ("date_started", models.DateTimeField(blank=True, null=True)),
+                ("date_finished", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="AnalysisJobEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("seq", models.IntegerField()),
+                ("data", models.JSONField()),
+                ("date_created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="events",
+                        to="Models.analysisjob",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["seq"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="analysisjob",
+            index=models.Index(
+                fields=["status", "date_created"], name="Models_anal_status_0fb8af_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="analysisjob",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("username"),
+                models.F("rules_hash"),
+                condition=models.Q(("status__in", ["queued", "running"])),
+                name="unique_active_analysis_job",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="analysisjobevent",
+            constraint=models.UniqueConstraint(
+                fields=("job", "seq"), name="unique_analysis_job_event"
+            ),
+        ),
+    ]
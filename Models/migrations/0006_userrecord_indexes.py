@@ -0,0 +1,27 @@
+# Generated by Django 4.2.15 on 2026-10-17 02:40
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Models", "0005_analysisjob"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="userrecord",
+            index=models.Index(
+                fields=["-lines_of_code", "-id"], name="userrecord_leaderboard_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="userrecord",
+            index=models.Index(
+                django.db.models.functions.text.Lower("username"),
+                name="userrecord_username_lower_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.15 on 2026-10-17 02:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_language_stats(apps, schema_editor):
+    UserRecord = apps.get_model("Models", "UserRecord")
+    LanguageStat = apps.get_model("Models", "LanguageStat")
+    records = UserRecord.objects.only("id", "lines_of_code_per_language")
+    for record in records.iterator():
+        LanguageStat.objects.bulk_create(
+            [
+                LanguageStat(user=record, language=language, lines_of_code=count)
+                for language, count in (record.lines_of_code_per_language or {}).items()
+                if count
+            ]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Models", "0006_userrecord_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LanguageStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("language", models.CharField(max_length=100)),
+                ("lines_of_code", models.IntegerField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="language_stats",
+                        to="Models.userrecord",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["language", "-lines_of_code", "-id"],
+                        name="languagestat_ranking_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="languagestat",
+            constraint=models.UniqueConstraint(
+                fields=("user", "language"), name="unique_user_language"
+            ),
+        ),
+        migrations.RunPython(backfill_language_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.15 on 2026-10-17 02:44
+
+from django.db import migrations, models
+
+
+def dedupe_usernames(apps, schema_editor):
+    # Concurrent requests used to insert one row each; keep the newest row
+    # per case-insensitive username
+    UserRecord = apps.get_model("Models", "UserRecord")
+    kept = set()
+    for record in UserRecord.objects.order_by("-date_requested", "-id").only(
+        "id", "username"
+    ):
+        key = record.username.lower()
+        if key in kept:
+            record.delete()
+            continue
+        kept.add(key)
+        UserRecord.objects.filter(id=record.id).update(username_key=key)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("Models", "0007_languagestat"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userrecord",
+            name="username_key",
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.RunPython(dedupe_usernames, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="userrecord",
+            name="username_key",
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.RemoveIndex(
+            model_name="userrecord",
+            name="userrecord_username_lower_idx",
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.15 on 2026-10-17 02:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Models", "0008_userrecord_username_key"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RepositoryFile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("path", models.TextField()),
+                ("blob_sha", models.CharField(max_length=40)),
+                ("language", models.CharField(max_length=100)),
+                ("lines_of_code", models.IntegerField()),
+                ("comment_lines", models.IntegerField()),
+                ("blank_lines", models.IntegerField()),
+                (
+                    "repository",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="files",
+                        to="Models.repositoryrecord",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="repositoryfile",
+            constraint=models.UniqueConstraint(
+                fields=("repository", "path"), name="unique_repository_file"
+            ),
+        ),
+    ]
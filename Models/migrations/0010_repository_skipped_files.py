@@ -0,0 +1,23 @@
+# Generated by Django 4.2.15 on 2026-10-17 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Models", "0009_repositoryfile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="repositoryfile",
+            name="skip_reason",
+            field=models.CharField(blank=True, default="", max_length=20),
+        ),
+        migrations.AddField(
+            model_name="repositoryrecord",
+            name="skipped_files",
+            field=models.JSONField(default=dict),
+        ),
+    ]
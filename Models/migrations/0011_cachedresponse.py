@@ -0,0 +1,38 @@
+# Generated by Django 4.2.15 on 2026-10-17 02:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Models", "0010_repository_skipped_files"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CachedResponse",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64, unique=True)),
+                ("url", models.TextField()),
+                ("etag", models.CharField(blank=True, default="", max_length=200)),
+                (
+                    "last_modified",
+                    models.CharField(blank=True, default="", max_length=100),
+                ),
+                ("headers", models.JSONField(default=dict)),
+                ("body", models.BinaryField()),
+                ("size", models.IntegerField()),
+                ("last_used", models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.15 on 2026-10-17 02:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+import json
+
+from django.utils.dateparse import parse_datetime
+
+
+def summarize_repositories(apps, schema_editor):
+    UserRecord = apps.get_model("Models", "UserRecord")
+    UserRepository = apps.get_model("Models", "UserRepository")
+    # values_list: the new reverse accessor shadows the field on instances
+    records = UserRecord.objects.values_list("id", "repositories")
+    for user_id, repositories in records.iterator():
+        # Older rows hold the JSON dump as a string
+        if isinstance(repositories, str):
+            repositories = json.loads(repositories)
+        UserRepository.objects.bulk_create(
+            [
+                UserRepository(
+                    user_id=user_id,
+                    name=repository["name"],
+                    size=repository.get("size") or 0,
+                    fork=bool(repository.get("fork")),
+                    default_branch=repository.get("default_branch") or "",
+                    pushed_at=(
+                        parse_datetime(repository["pushed_at"])
+                        if repository.get("pushed_at")
+                        else None
+                    ),
+                )
+                for repository in repositories or []
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Models", "0011_cachedresponse"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserRepository",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("size", models.IntegerField()),
+                ("fork", models.BooleanField()),
+                ("default_branch", models.CharField(max_length=100)),
+                ("pushed_at", models.DateTimeField(null=True)),
+                ("lines_of_code", models.IntegerField(null=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="repositories",
+                        to="Models.userrecord",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="userrepository",
+            constraint=models.UniqueConstraint(
+                fields=("user", "name"), name="unique_user_repository"
+            ),
+        ),
+        migrations.RunPython(summarize_repositories, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="userrecord",
+            name="repositories",
+        ),
+    ]
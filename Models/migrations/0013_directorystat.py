@@ -0,0 +1,39 @@
+# Generated by Django 4.2.15 on 2026-10-17 03:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Models", "0012_userrepository"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DirectoryStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("count", models.BigIntegerField(default=0)),
+                ("repositories", models.IntegerField(default=0)),
+                ("date_updated", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["-repositories", "-count"],
+                        name="directorystat_ranking_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.15 on 2026-10-17 03:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Models", "0013_directorystat"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="analysisjobevent",
+            name="attempt",
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name="analysisjob",
+            index=models.Index(
+                fields=["date_finished"], name="Models_anal_date_fi_c287a6_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.15 on 2026-10-17 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Models", "0014_analysisjobevent_attempt"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="repositoryrecord",
+            name="directories",
+            field=models.JSONField(null=True),
+        ),
+    ]
@@ -1,14 +1,226 @@
 from django.db import models
+from django.db.models.functions import Lower
 
 # Create your models here.
 
 
+class UserRecordQuerySet(models.QuerySet):
+    def for_username(self, username):
+        return self.filter(username_key=username.lower())
+
+
 class UserRecord(models.Model): 
     lines_of_code = models.IntegerField() 
     lines_of_code_per_language = models.JSONField()
     username = models.CharField(max_length=100)
-    repositories = models.JSONField()
+    # Lowercased username; GitHub logins are case-insensitive
+    username_key = models.CharField(max_length=100, unique=True)
     date_requested = models.DateTimeField(auto_now_add=True)     
+
+    objects = UserRecordQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Leaderboard order, with id as the tie-breaker for keyset pagination
+            models.Index(fields=['-lines_of_code', '-id'], name='userrecord_leaderboard_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.username_key = self.username.lower()
+        super().save(*args, **kwargs)
+
     def __str__(self): 
         return self.username
-    
+
+
+class UserRepository(models.Model):
+    # The listing fields we use of each repository of an analyzed profile;
+    # `lines_of_code` is null when the repository was skipped or failed
+    user = models.ForeignKey(UserRecord, on_delete=models.CASCADE, related_name='repositories')
+    name = models.CharField(max_length=100)
+    size = models.IntegerField()
+    fork = models.BooleanField()
+    default_branch = models.CharField(max_length=100)
+    pushed_at = models.DateTimeField(null=True)
+    lines_of_code = models.IntegerField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_user_repository'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.name}"
+
+
+class RepositoryRecord(models.Model):
+    owner = models.CharField(max_length=100)
+    name = models.CharField(max_length=100)
+    commit_sha = models.CharField(max_length=40)
+    rules_hash = models.CharField(max_length=64)
+    lines_of_code = models.IntegerField()
+    comment_lines = models.IntegerField()
+    blank_lines = models.IntegerField()
+    lines_of_code_per_language = models.JSONField()
+    # Files left out by content sniffing, per reason (e.g. {"minified": 3})
+    skipped_files = models.JSONField(default=dict)
+    # Paths of the directories not ignored, carried over by incremental
+    # analyses; null for records stored before they were kept
+    directories = models.JSONField(null=True)
+    date_analyzed = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'name', 'commit_sha', 'rules_hash'],
+                name='unique_repository_analysis',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner}/{self.name}@{self.commit_sha[:7]}"
+
+
+class RepositoryFile(models.Model):
+    # Per-file counts of an analyzed commit, so the next analysis of the
+    # repository only has to count the files that changed since
+    repository = models.ForeignKey(RepositoryRecord, on_delete=models.CASCADE, related_name='files')
+    path = models.TextField()
+    blob_sha = models.CharField(max_length=40)
+    language = models.CharField(max_length=100)
+    lines_of_code = models.IntegerField()
+    comment_lines = models.IntegerField()
+    blank_lines = models.IntegerField()
+    # Why the file was not counted (binary, generated, ...); empty if it was
+    skip_reason = models.CharField(max_length=20, blank=True, default='')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['repository', 'path'], name='unique_repository_file'),
+        ]
+
+    def __str__(self):
+        return f"{self.repository_id}:{self.path}"
+
+
+class AnalysisJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    ACTIVE_STATUSES = [QUEUED, RUNNING]
+
+    username = models.CharField(max_length=100)
+    rules_hash = models.CharField(max_length=64)
+    ignore_dirs = models.JSONField()
+    ignore_extensions = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    processed_repos = models.IntegerField(default=0)
+    total_repos = models.IntegerField(default=0)
+    last_seq = models.IntegerField(default=0)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_started = models.DateTimeField(null=True, blank=True)
+    date_finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # At most one queued or running job per user and rule set
+            models.UniqueConstraint(
+                Lower('username'),
+                'rules_hash',
+                condition=models.Q(status__in=['queued', 'running']),
+                name='unique_active_analysis_job',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'date_created']),
+            models.Index(fields=['date_finished']),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status not in self.ACTIVE_STATUSES
+
+    def __str__(self):
+        return f"{self.username} ({self.status})"
+
+
+class AnalysisJobEvent(models.Model):
+    job = models.ForeignKey(AnalysisJob, on_delete=models.CASCADE, related_name='events')
+    seq = models.IntegerField()
+    # The run of the job that recorded the event; a requeued job starts over,
+    # so viewers only get the events of its latest attempt
+    attempt = models.IntegerField(default=1)
+    data = models.JSONField()
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['seq']
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'seq'], name='unique_analysis_job_event'),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id}:{self.seq}"
+
+
+class LanguageStat(models.Model):
+    user = models.ForeignKey(UserRecord, on_delete=models.CASCADE, related_name='language_stats')
+    language = models.CharField(max_length=100)
+    lines_of_code = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'language'], name='unique_user_language'),
+        ]
+        indexes = [
+            # Per-language ranking, with id as the keyset tie-breaker
+            models.Index(fields=['language', '-lines_of_code', '-id'], name='languagestat_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}:{self.language}"
+
+
+class CachedResponse(models.Model):
+    # A GitHub API response kept for revalidation: the next request for the
+    # same URL sends its ETag / Last-Modified, and a 304 reuses the body
+    key = models.CharField(max_length=64, unique=True)
+    url = models.TextField()
+    etag = models.CharField(max_length=200, blank=True, default='')
+    last_modified = models.CharField(max_length=100, blank=True, default='')
+    # The headers callers read back, e.g. Link for pagination
+    headers = models.JSONField(default=dict)
+    body = models.BinaryField()
+    size = models.IntegerField()
+    last_used = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.url
+
+
+class DirectoryStat(models.Model):
+    # How often a directory name turns up in analyzed repositories, to tune
+    # the default ignore rules with; ignored directories are not counted
+    name = models.CharField(max_length=255, unique=True)
+    count = models.BigIntegerField(default=0)
+    repositories = models.IntegerField(default=0)
+    date_updated = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-repositories', '-count'], name='directorystat_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
 application = get_asgi_application()
+
+from API.utils.Disconnect import CancelOnDisconnect  # noqa: E402
+from API.utils.Metrics import publish as publish_metrics  # noqa: E402
+
+application = CancelOnDisconnect(application)
+publish_metrics()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+import tempfile
 from corsheaders.defaults import default_headers
 import environ
 
@@ -139,3 +140,102 @@ STATIC_ROOT = 'static'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Repository analysis
+# Number of repositories analyzed concurrently per profile request
+ANALYSIS_CONCURRENCY = env.int('ANALYSIS_CONCURRENCY', default=4)
+# Count lines straight from the downloaded zip instead of extracting it to disk
+ANALYSIS_IN_MEMORY = env.bool('ANALYSIS_IN_MEMORY', default=True)
+# Archives are streamed into a spooled buffer that spills to disk past the
+# threshold; downloads abort once more than MAX_ARCHIVE_BYTES have arrived
+ARCHIVE_SPOOL_THRESHOLD = env.int('ARCHIVE_SPOOL_THRESHOLD', default=8 * 1024 * 1024)
+MAX_ARCHIVE_BYTES = env.int('MAX_ARCHIVE_BYTES', default=200 * 1024 * 1024)
+
+# Shared HTTP client used for every GitHub call
+HTTP_POOL_LIMIT = env.int('HTTP_POOL_LIMIT', default=100)
+HTTP_POOL_LIMIT_PER_HOST = env.int('HTTP_POOL_LIMIT_PER_HOST', default=20)
+HTTP_DNS_CACHE_TTL = env.int('HTTP_DNS_CACHE_TTL', default=300)  # seconds
+HTTP_KEEPALIVE_TIMEOUT = env.float('HTTP_KEEPALIVE_TIMEOUT', default=30)
+HTTP_CONNECT_TIMEOUT = env.float('HTTP_CONNECT_TIMEOUT', default=10)
+HTTP_READ_TIMEOUT = env.float('HTTP_READ_TIMEOUT', default=60)
+HTTP_TOTAL_TIMEOUT = env.float('HTTP_TOTAL_TIMEOUT', default=None)
+# Processes used to count lines; defaults to one per core
+COUNTING_PROCESSES = env.int('COUNTING_PROCESSES', default=None)
+
+# Background analysis jobs (`manage.py run_analysis_worker`)
+# Repositories larger than this many kilobytes are skipped
+MAX_REPOSITORY_SIZE = env.int('MAX_REPOSITORY_SIZE', default=150000)
+# Worker processes, each running one profile analysis at a time
+ANALYSIS_WORKERS = env.int('ANALYSIS_WORKERS', default=2)
+# Seconds between polls for new jobs (workers) and new events (SSE viewers)
+JOB_POLL_INTERVAL = env.float('JOB_POLL_INTERVAL', default=0.5)
+# Running jobs refresh their heartbeat this often; a job silent for
+# JOB_STALE_AFTER seconds is requeued, up to JOB_MAX_ATTEMPTS runs in total
+JOB_HEARTBEAT_INTERVAL = env.float('JOB_HEARTBEAT_INTERVAL', default=10)
+JOB_STALE_AFTER = env.float('JOB_STALE_AFTER', default=60)
+JOB_MAX_ATTEMPTS = env.int('JOB_MAX_ATTEMPTS', default=3)
+# Finished jobs and their events are deleted after this many seconds; a
+# client can resume a finished job's stream until then
+JOB_RETENTION = env.float('JOB_RETENTION', default=7 * 24 * 3600)
+
+# Leaderboard count and first page are cached for this many seconds and
+# dropped whenever a UserRecord is written. Writes made by the analysis
+# worker only reach the web processes' caches if CACHE_URL points at a
+# shared backend (e.g. dbcache:// or rediscache://); with the default
+# per-process memory cache they show up once the TTL expires.
+CACHES = {'default': env.cache('CACHE_URL', default='locmemcache://')}
+LEADERBOARD_CACHE_TTL = env.int('LEADERBOARD_CACHE_TTL', default=60)
+
+# GitHub endpoints; point them at a local stand-in to test without GitHub
+GITHUB_API_BASE = env('GITHUB_API_BASE', default='https://api.github.com').rstrip('/')
+GITHUB_ARCHIVE_BASE = env('GITHUB_ARCHIVE_BASE', default='https://github.com').rstrip('/')
+# Refreshes of a previously analyzed repository download only the files
+# changed since the stored commit, as long as GitHub's compare API lists
+# fewer than INCREMENTAL_MAX_FILES of them (it stops listing at 300)
+INCREMENTAL_ANALYSIS = env.bool('INCREMENTAL_ANALYSIS', default=True)
+INCREMENTAL_MAX_FILES = env.int('INCREMENTAL_MAX_FILES', default=300)
+# Files larger than this many bytes are not counted; neither are files the
+# content sniffer recognizes as binary, generated or minified
+MAX_FILE_BYTES = env.int('MAX_FILE_BYTES', default=1024 * 1024)
+# GitHub requests are spread over these tokens (comma separated), picking
+# the one with the most rate limit budget left. Spent or secondary-limited
+# tokens are set aside until GitHub allows them again; requests wait up to
+# GITHUB_RATE_LIMIT_MAX_WAIT seconds for one before failing. The last
+# GITHUB_RATE_LIMIT_RESERVE requests of a token's hourly budget (at most a
+# tenth of its limit) are spread evenly over the rest of the hour.
+GITHUB_TOKENS = env.list('GITHUB_TOKENS', default=[token for token in [env('GITHUB_TOKEN', default='')] if token])
+GITHUB_RATE_LIMIT_MAX_WAIT = env.float('GITHUB_RATE_LIMIT_MAX_WAIT', default=3600)
+GITHUB_RATE_LIMIT_RESERVE = env.int('GITHUB_RATE_LIMIT_RESERVE', default=100)
+# 5xx responses and connection errors are retried this many times
+GITHUB_MAX_RETRIES = env.int('GITHUB_MAX_RETRIES', default=4)
+# GitHub API responses (repository listings, repository info, head commits)
+# are stored in the database and revalidated with If-None-Match, so an
+# unchanged answer comes back as a 304 that costs no rate limit. The least
+# recently used responses are dropped beyond HTTP_CACHE_MAX_BYTES.
+HTTP_CACHE = env.bool('HTTP_CACHE', default=True)
+HTTP_CACHE_MAX_BYTES = env.int('HTTP_CACHE_MAX_BYTES', default=50 * 1024 * 1024)
+# Metrics served at /API/metrics. Each process writes its values to
+# METRICS_DIR at most every METRICS_FLUSH_INTERVAL seconds and the endpoint
+# adds up every process on the host, so the worker's analyses show up too;
+# set it to an empty string to only report the web process itself.
+METRICS_DIR = env('METRICS_DIR', default=str(Path(tempfile.gettempdir()) / 'githubdev-metrics'))
+METRICS_FLUSH_INTERVAL = env.float('METRICS_FLUSH_INTERVAL', default=1.0)
+# Snapshots of exited processes still count for this many seconds, so their
+# last values are scraped, and are then deleted
+METRICS_DEAD_RETENTION = env.float('METRICS_DEAD_RETENTION', default=900)
+# One in this many counted files is logged at DEBUG level
+FILE_LOG_SAMPLE = env.int('FILE_LOG_SAMPLE', default=1000)
+# `manage.py prewarm_profiles`: profiles analyzed at once, and the file that
+# records finished profiles so an interrupted run can resume
+PREWARM_CONCURRENCY = env.int('PREWARM_CONCURRENCY', default=2)
+PREWARM_CHECKPOINT = env('PREWARM_CHECKPOINT', default=str(Path(tempfile.gettempdir()) / 'githubdev-prewarm.json'))
+# Directory names seen by analyses are counted in memory and merged into
+# DirectoryStat every DIRECTORY_STATS_FLUSH_INTERVAL seconds, when
+# DIRECTORY_STATS_MAX_PENDING names are waiting, and at the end of each job
+DIRECTORY_STATS_FLUSH_INTERVAL = env.float('DIRECTORY_STATS_FLUSH_INTERVAL', default=60.0)
+DIRECTORY_STATS_MAX_PENDING = env.int('DIRECTORY_STATS_MAX_PENDING', default=10000)
+# getLinesOfCode streams: progress events less than SSE_COALESCE_WINDOW
+# seconds apart are sent as one, and a comment is sent after
+# SSE_KEEPALIVE_INTERVAL quiet seconds to keep the connection open
+SSE_COALESCE_WINDOW = env.float('SSE_COALESCE_WINDOW', default=0.5)
+SSE_KEEPALIVE_INTERVAL = env.float('SSE_KEEPALIVE_INTERVAL', default=15.0)
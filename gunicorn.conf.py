@@ -0,0 +1,10 @@
+# Picked up automatically by gunicorn from the working directory
+
+
+def worker_exit(server, worker):
+    # Close pooled GitHub connections and counting processes before the
+    # worker goes away
+    from API.utils.CountingEngine import shutdown_pool
+    from API.utils.HttpClient import close_sessions
+    close_sessions()
+    shutdown_pool()